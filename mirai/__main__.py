@@ -1,3 +1,13 @@
-from .core import main
+import sys
 
-main()
\ No newline at end of file
+# `python3 -m mirai serve ...` runs headless for network clients, `transcribe ...` processes recordings,
+# anything else starts the robot
+if len(sys.argv) > 1 and sys.argv[1] == "serve":
+    from .server import main
+    main(sys.argv[2:])
+elif len(sys.argv) > 1 and sys.argv[1] == "transcribe":
+    from .transcribe import main
+    main(sys.argv[2:])
+else:
+    from .core import main
+    main()
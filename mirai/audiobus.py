@@ -0,0 +1,85 @@
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+class AudioBus:
+    def __init__(self, seconds: float = 60.0, samplerate: int = 16000):
+        self.logger = logging.getLogger("AudioBus")
+        self.samplerate = samplerate
+        self.capacity = int(seconds * samplerate)
+
+        # Every sample is written twice, capacity apart, so any span up to capacity is one contiguous view
+        self.shm = shared_memory.SharedMemory(create=True, size=2 * self.capacity * np.dtype(np.float32).itemsize)
+        self.buffer = np.ndarray((2 * self.capacity,), dtype=np.float32, buffer=self.shm.buf)
+        self.buffer[:] = 0
+
+        self.cursor = multiprocessing.Value('q', 0)
+        self.written = multiprocessing.Condition(self.cursor.get_lock())
+        self.owner = True
+
+        self.logger.info(f"Allocated {seconds}s audio bus at {self.shm.name}")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["buffer"]
+        del state["logger"]
+        state["owner"] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = logging.getLogger("AudioBus")
+        self.buffer = np.ndarray((2 * self.capacity,), dtype=np.float32, buffer=self.shm.buf)
+
+    @property
+    def write_cursor(self) -> int:
+        return self.cursor.value
+
+    def write(self, samples: np.ndarray):
+        # Single writer; readers only ever look behind the published cursor
+        frames = len(samples)
+        if frames > self.capacity:
+            samples = samples[-self.capacity:]
+            frames = self.capacity
+
+        position = self.cursor.value % self.capacity
+        self.buffer[position:position + frames] = samples
+
+        first = min(frames, self.capacity - position)
+        self.buffer[position + self.capacity:position + self.capacity + first] = samples[:first]
+        self.buffer[:frames - first] = samples[first:]
+
+        with self.written:
+            self.cursor.value += frames
+            self.written.notify_all()
+
+    def wait(self, cursor: int, timeout: float = None) -> int:
+        # Blocks until the writer has passed cursor, returning the write cursor either way
+        with self.written:
+            self.written.wait_for(lambda: self.cursor.value >= cursor, timeout)
+            return self.cursor.value
+
+    def oldest(self) -> int:
+        return max(0, self.write_cursor - self.capacity)
+
+    def is_valid(self, start: int) -> bool:
+        return start >= self.oldest()
+
+    def view(self, start: int, end: int) -> np.ndarray:
+        # Zero-copy view of samples [start, end); call is_valid(start) afterwards to detect overwrites
+        if end > self.write_cursor:
+            raise ValueError(f"Audio span ends at {end} but only {self.write_cursor} samples were written")
+
+        if not self.is_valid(start):
+            raise RuntimeError(f"Audio span starting at {start} was overwritten, oldest sample is {self.oldest()}")
+
+        position = start % self.capacity
+        return self.buffer[position:position + (end - start)]
+
+    def close(self):
+        self.buffer = None
+        self.shm.close()
+
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+from argparse import ArgumentParser
+from time import perf_counter, sleep
+from ..core import MirAI
+from .standins import FileMicrophone, NullSink, StubLLMServer
+
+STAGES = ["stt", "llm_first_token", "first_sentence", "tts_first_audio", "release_to_audio", "turn"]
+
+def wait_for(condition, timeout: float, interval: float = 0.01) -> bool:
+    deadline = perf_counter() + timeout
+    while not condition():
+        if perf_counter() > deadline:
+            return False
+        sleep(interval)
+    return True
+
+def run_turn(mirai: MirAI, microphone: FileMicrophone, sink: NullSink, stub: StubLLMServer, marks: dict, path: str, timeout: float) -> dict:
+    marks.clear()
+    sink.reset()
+    stub.first_token = None
+    completed = mirai.model.completed
+
+    mirai.toggle_listening()
+    microphone.play(path)
+    microphone.finished.wait()
+
+    release = perf_counter()
+    mirai.toggle_listening()
+
+    if not wait_for(lambda: mirai.model.completed > completed, timeout):
+        return None
+
+    transcript = marks.get("transcript")
+    say = marks.get("say")
+    stage = {
+        "stt": (release, transcript),
+        "llm_first_token": (transcript, stub.first_token),
+        "first_sentence": (stub.first_token, say),
+        "tts_first_audio": (say, sink.first_write),
+        "release_to_audio": (release, sink.first_write),
+        "turn": (release, perf_counter()),
+    }
+
+    return {name: end - start for name, (start, end) in stage.items() if start is not None and end is not None}
+
+def main():
+    parser = ArgumentParser(description="Replay recorded turns through the full MirAI pipeline without hardware")
+    parser.add_argument('turns', nargs='+', help="Audio files, one per user turn, played in order")
+    parser.add_argument('-v', '--voice', required=True, type=str, help="Voice Model File (.onnx)")
+    parser.add_argument('-c', '--config', type=str, default="config.json", help="Base configuration file")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="Times to run the whole script")
+    parser.add_argument('--token-rate', type=float, default=8.0, help="Stub LLM tokens per second")
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help="Stub LLM prompt processing time in seconds")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds to wait for a turn to complete")
+    parser.add_argument('-o', '--output', type=str, help="Write per-turn timings as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename="bench_pipeline.log", level=logging.DEBUG)
+
+    voice = os.path.abspath(args.voice)
+    turns = [os.path.abspath(path) for path in args.turns]
+    output = os.path.abspath(args.output) if args.output else None
+
+    config = {}
+    try:
+        with open(args.config, 'r') as file:
+            config = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    stub = StubLLMServer(token_rate=args.token_rate, first_token_delay=args.first_token_delay)
+    stub.start()
+    config.update({"base_host": stub.host, "base_port": stub.port, "cheat_host": stub.host, "cheat_port": stub.port, "prompt": config.get("prompt", "You are a useful AI assistant. Please help the user.")})
+
+    # Chat history and logs land in a scratch directory, not the real one
+    workdir = tempfile.mkdtemp(prefix="mirai_bench_")
+    os.chdir(workdir)
+    with open("config.json", 'w') as file:
+        json.dump(config, file)
+
+    microphone = FileMicrophone()
+    sink = NullSink()
+    results = []
+
+    mirai = MirAI(voice, microphone, None, config_path="config.json", audio_sink=sink)
+
+    print("Waiting for Whisper and Piper to load...")
+    if not mirai.startup.wait_all(args.timeout):
+        print(f"Startup did not finish within {args.timeout:.0f} seconds: {mirai.startup.status()}")
+        mirai.shutdown()
+        mirai.invoker_thread.join()
+        stub.close()
+        return
+
+    sink.samplerate = mirai.model.tts.voice.config.sample_rate
+
+    marks = {}
+    transcribe_submit = mirai.transcribe_submit
+    say = mirai.model.tts.say
+
+    def timed_transcribe(*submit_args):
+        result = transcribe_submit(*submit_args)
+        marks["transcript"] = perf_counter()
+        return result
+
+    def timed_say(*say_args):
+        marks.setdefault("say", perf_counter())
+        return say(*say_args)
+
+    mirai.transcribe_submit = timed_transcribe
+    mirai.model.tts.say = timed_say
+
+    for run in range(args.repeat):
+        for path in turns:
+            timings = run_turn(mirai, microphone, sink, stub, marks, path, args.timeout)
+            if timings is None:
+                print(f"Turn {os.path.basename(path)} did not complete within {args.timeout:.0f} seconds")
+                continue
+
+            results.append({"run": run, "audio": path, **timings})
+            print(f"[{run}] {os.path.basename(path)}: " + ", ".join(f"{name} {value:.3f}s" for name, value in timings.items()))
+
+    mirai.shutdown()
+    mirai.invoker_thread.join()
+
+    stub.close()
+
+    print(f"\n{len(results)} turns, scratch directory {workdir}")
+    print(f"{'stage':<20}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for name in STAGES:
+        values = [result[name] for result in results if name in result]
+        if values:
+            print(f"{name:<20}{np.percentile(values, 50):>8.3f}{np.percentile(values, 95):>8.3f}{max(values):>8.3f}")
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+from argparse import ArgumentParser
+from time import process_time
+from ..resample import StreamingResampler
+
+def time_per_second(process, audio: np.ndarray, chunk_frames: int, duration: float) -> float:
+    start = process_time()
+    for i in range(0, len(audio) - chunk_frames + 1, chunk_frames):
+        process(audio[i:i + chunk_frames])
+    end = process_time()
+
+    return (end - start) / duration * 1000
+
+def main():
+    parser = ArgumentParser(description="Compare resampler CPU time per second of audio")
+    parser.add_argument('-s', '--seconds', type=float, default=30.0, help="Seconds of audio to process")
+    parser.add_argument('-c', '--chunk', type=float, default=0.5, help="Chunk duration in seconds")
+    parser.add_argument('--orig-sr', type=int, default=44100, help="Device sample rate")
+    parser.add_argument('--target-sr', type=int, default=16000, help="Whisper sample rate")
+    args = parser.parse_args()
+
+    # Speech-band tones over noise, shaped like a microphone capture
+    t = np.arange(int(args.seconds * args.orig_sr)) / args.orig_sr
+    rng = np.random.default_rng(0)
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 3100 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+    chunk_frames = int(args.chunk * args.orig_sr)
+
+    results = {}
+
+    resampler = StreamingResampler(args.orig_sr, args.target_sr)
+    results["StreamingResampler"] = time_per_second(resampler.process, audio, chunk_frames, args.seconds)
+
+    try:
+        from librosa import resample
+        results["librosa.resample (per chunk)"] = time_per_second(lambda chunk: resample(chunk, orig_sr=args.orig_sr, target_sr=args.target_sr), audio, chunk_frames, args.seconds)
+    except ImportError:
+        print("librosa not installed, skipping the per-chunk baseline")
+
+    print(f"{args.orig_sr}Hz -> {args.target_sr}Hz, {args.chunk}s chunks, {args.seconds}s of audio")
+    for name, cost in results.items():
+        print(f"{name:<32} {cost:8.3f} ms CPU per second of audio")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import logging
+import socket
+import httpx
+from argparse import ArgumentParser
+from time import perf_counter, sleep
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from ..router import CircuitBreaker, HedgedRouter
+from .standins import StubLLMServer
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def client_stream(model: ChatOpenAI):
+    def stream(messages: list):
+        for r in model.stream(messages):
+            yield r.content
+    return stream
+
+def main():
+    parser = ArgumentParser(description="Exercise cheat mode routing against stub remote and local servers")
+    parser.add_argument('--deadline', type=float, default=1.0, help="Seconds to wait for the remote's first token")
+    parser.add_argument('--probe-interval', type=float, default=0.5, help="Seconds between health probes of a failed remote")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    local = StubLLMServer(token_rate=50.0, first_token_delay=0.1, reply="Local answer.")
+    local.start()
+    remote_port = free_port()
+    remote_url = f"http://127.0.0.1:{remote_port}/v1"
+
+    client = httpx.Client(timeout=httpx.Timeout(30.0, connect=1.0), limits=httpx.Limits(max_keepalive_connections=2, keepalive_expiry=120.0))
+    remote_model = ChatOpenAI(model="stub", base_url=remote_url, api_key="not_needed", http_client=client, max_retries=0)
+    local_model = ChatOpenAI(model="stub", base_url=f"http://{local.host}:{local.port}/v1", api_key="not_needed", max_retries=0)
+
+    def probe() -> bool:
+        try:
+            return client.get(f"{remote_url}/models", timeout=1.0).status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    breaker = CircuitBreaker(probe, probe_interval=args.probe_interval)
+    router = HedgedRouter(client_stream(remote_model), client_stream(local_model), breaker, args.deadline)
+
+    def ask(scenario: str):
+        start = perf_counter()
+        first = None
+        reply = ""
+        for content in router.stream([HumanMessage(content="Hello?")]):
+            if first is None:
+                first = perf_counter() - start
+            reply += content
+        print(f"{scenario:<24} first token {first:.2f}s, total {perf_counter() - start:.2f}s, breaker {'open' if breaker.open else 'closed'}: {reply!r}")
+
+    ask("remote down")
+    ask("remote still down")
+
+    remote = StubLLMServer(port=remote_port, token_rate=50.0, first_token_delay=args.deadline * 3, reply="Slow remote answer.")
+    remote.start()
+    breaker.closed.wait(args.probe_interval * 10)
+    ask("remote slow")
+
+    remote.first_token_delay = 0.1
+    breaker.closed.wait(args.probe_interval * 10)
+    ask("remote recovered")
+
+    # Let the abandoned slow request finish before the stubs go away
+    sleep(args.deadline * 3)
+    breaker.close()
+    client.close()
+    remote.close()
+    local.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import json
+import socket
+import numpy as np
+import soundfile as sf
+from argparse import ArgumentParser
+from threading import Barrier, Thread
+from time import perf_counter, sleep
+from ..protocol import AUDIO, JSON, Connection
+from ..resample import StreamingResampler
+
+def load_turn(path: str, samplerate: int = 16000) -> np.ndarray:
+    audio, source_rate = sf.read(path, dtype='float32', always_2d=True)
+    audio = audio[:, 0]
+    if source_rate != samplerate:
+        audio = StreamingResampler(source_rate, samplerate).process(audio).copy()
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+def run_client(address, session_id: str, turns: list, chunk_seconds: float, realtime: bool, start: Barrier, results: list):
+    # One simulated user: streams each recording like a microphone, then waits for the whole spoken reply
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+    else:
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(address)
+    connection = Connection(sock)
+    connection.send_json({"type": "hello", "session": session_id})
+    kind, ready = connection.receive()
+    if kind != JSON or ready.get("type") != "ready":
+        raise RuntimeError(f"Session {session_id} was refused: {ready}")
+
+    start.wait()
+    chunk = int(chunk_seconds * 16000)
+    for audio in turns:
+        for i in range(0, len(audio), chunk):
+            connection.send_audio(audio[i:i + chunk])
+            if realtime:
+                sleep(chunk_seconds)
+
+        released = perf_counter()
+        connection.send_json({"type": "end"})
+        first_audio = None
+        pcm_seconds = 0.0
+        while True:
+            kind, message = connection.receive()
+            if kind is None:
+                raise RuntimeError(f"Session {session_id} was disconnected")
+            if kind == AUDIO:
+                first_audio = first_audio or perf_counter() - released
+                pcm_seconds += len(message) / ready["samplerate"]
+            elif message["type"] == "error":
+                raise RuntimeError(message["message"])
+            elif message["type"] == "done":
+                results.append({"session": session_id, "first_audio": first_audio, "pcm_seconds": pcm_seconds, **{name: value for name, value in message["timings"].items() if name != "first_audio"}, "client_turn": perf_counter() - released})
+                break
+
+    connection.send_json({"type": "bye"})
+    connection.close()
+
+def run_level(address, sessions: int, turns: list, args) -> tuple:
+    results = []
+    start = Barrier(sessions + 1)
+    clients = [Thread(target=run_client, args=(address, f"load-{sessions}-{i}", turns, args.chunk, not args.fast, start, results), daemon=True) for i in range(sessions)]
+    for client in clients:
+        client.start()
+
+    start.wait()
+    began = perf_counter()
+    for client in clients:
+        client.join()
+    return results, perf_counter() - began
+
+def main():
+    parser = ArgumentParser(description="Load a `python3 -m mirai serve` instance with concurrent simulated sessions")
+    parser.add_argument('turns', nargs='+', help="Audio files, one per user turn, sent in order by every session")
+    parser.add_argument('--host', type=str, default="127.0.0.1", help="Server address")
+    parser.add_argument('--port', type=int, default=8765, help="Server TCP port")
+    parser.add_argument('--unix', type=str, help="Connect to this Unix socket instead of TCP")
+    parser.add_argument('-s', '--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Concurrent session counts to try")
+    parser.add_argument('--chunk', type=float, default=0.1, help="Seconds of audio per frame")
+    parser.add_argument('--fast', action='store_true', help="Send audio as fast as possible instead of in real time")
+    parser.add_argument('--slo', type=float, default=3.0, help="p95 end-of-speech to first audio, in seconds, a session count must meet")
+    parser.add_argument('-o', '--output', type=str, help="Write per-turn timings as JSON")
+    args = parser.parse_args()
+
+    address = args.unix or (args.host, args.port)
+    turns = [load_turn(path) for path in args.turns]
+    supported = 0
+    rows = []
+
+    print(f"{'sessions':>8}{'turns':>7}{'turns/min':>11}{'stt p50':>9}{'audio p50':>11}{'audio p95':>11}{'turn p95':>10}")
+    for sessions in args.sessions:
+        results, elapsed = run_level(address, sessions, turns, args)
+        rows.extend({"sessions": sessions, **result} for result in results)
+        if not results:
+            print(f"{sessions:>8} no turns completed")
+            break
+
+        first_audio = [result["first_audio"] for result in results if result["first_audio"] is not None]
+        p95_audio = np.percentile(first_audio, 95) if first_audio else float("inf")
+        print(f"{sessions:>8}{len(results):>7}{len(results) / elapsed * 60:>11.1f}{np.percentile([result['stt'] for result in results], 50):>9.2f}"
+              f"{np.percentile(first_audio, 50) if first_audio else float('nan'):>11.2f}{p95_audio:>11.2f}{np.percentile([result['client_turn'] for result in results], 95):>10.2f}")
+
+        if p95_audio <= args.slo and len(results) == sessions * len(turns):
+            supported = sessions
+
+    print(f"\nSessions per box within a {args.slo:.1f}s p95 first-audio target: {supported}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(rows, file, indent=2)
+
+if __name__ == "__main__":
+    main()
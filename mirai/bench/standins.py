@@ -0,0 +1,193 @@
+import json
+import logging
+import multiprocessing
+import re
+import numpy as np
+import soundfile as sf
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty
+from threading import Thread
+from time import perf_counter, sleep, time
+from ..resample import StreamingResampler
+
+class FileMicrophone:
+    # Plays queued recordings through the Microphone read() interface, and silence in between
+    def __init__(self, target_sr: int = 16000, realtime: bool = True):
+        self.logger = logging.getLogger("FileMicrophone")
+        self.samplerate = target_sr
+        self.target_sr = target_sr
+        self.realtime = realtime
+        self.overruns = 0
+        self.input_overflows = 0
+
+        self.queue = multiprocessing.Queue()
+        self.finished = multiprocessing.Event()
+        self.finished.set()
+
+        self.current = None
+        self.offset = 0
+        self.clock = None
+
+    def play(self, path: str):
+        self.finished.clear()
+        self.queue.put(path)
+
+    def load(self, path: str) -> np.ndarray:
+        audio, samplerate = sf.read(path, dtype='float32', always_2d=True)
+        audio = audio[:, 0]
+        if samplerate != self.target_sr:
+            audio = StreamingResampler(samplerate, self.target_sr).process(audio).copy()
+
+        self.logger.debug(f"Playing {path}, {len(audio) / self.target_sr:.2f} seconds")
+        return audio
+
+    def read(self, frames: int, out: np.ndarray = None, timeout: float = None) -> np.ndarray:
+        if out is None:
+            out = np.empty(frames, dtype=np.float32)
+
+        # Paced like a real device so streaming decodes and endpointing see live timing
+        if self.realtime:
+            now = perf_counter()
+            if self.clock is None or self.clock < now - 1.0:
+                self.clock = now
+            self.clock += frames / self.target_sr
+            sleep(max(0, self.clock - now))
+
+        filled = 0
+        while filled < frames:
+            if self.current is None:
+                try:
+                    self.current = self.load(self.queue.get_nowait())
+                    self.offset = 0
+                except Empty:
+                    out[filled:frames] = 0
+                    break
+
+            count = min(frames - filled, len(self.current) - self.offset)
+            out[filled:filled + count] = self.current[self.offset:self.offset + count]
+            filled += count
+            self.offset += count
+
+            if self.offset >= len(self.current):
+                self.current = None
+                self.finished.set()
+
+        return out[:frames]
+
+    def close(self):
+        pass
+
+class NullSink:
+    # Swallows TTS audio like an OutputStream, blocking for the playback time of what is already queued
+    def __init__(self, samplerate: int = 22050, realtime: bool = True):
+        self.samplerate = samplerate
+        self.realtime = realtime
+        self.reset()
+
+    def reset(self):
+        self.first_write = None
+        self.samples = 0
+        self.play_until = 0.0
+
+    def start(self):
+        pass
+
+    def write(self, data):
+        now = perf_counter()
+        if self.first_write is None:
+            self.first_write = now
+
+        if self.realtime:
+            sleep(max(0, self.play_until - now))
+            self.play_until = max(now, self.play_until) + len(data) / self.samplerate
+
+        self.samples += len(data)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+DEFAULT_REPLY = "Sure, I can help with that. The weather today looks clear with a light breeze. Is there anything else you would like to know?"
+
+class StubLLMServer:
+    # OpenAI compatible /v1 endpoint that streams a canned reply at a fixed token rate
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token_rate: float = 20.0, first_token_delay: float = 0.3, reply: str = DEFAULT_REPLY):
+        self.logger = logging.getLogger("StubLLMServer")
+        self.token_rate = token_rate
+        self.first_token_delay = first_token_delay
+        self.tokens = re.findall(r"\S+\s*", reply)
+        self.requests = 0
+        self.first_token = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                stub.logger.debug(format % args)
+
+            def send_json(self, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self.send_json({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "mirai"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.requests += 1
+                stub.serve_completion(self, request)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    def chunk(self, model: str, delta: dict, finish_reason: str = None) -> bytes:
+        payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time()), "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(payload)}\n\n".encode()
+
+    def serve_completion(self, handler: BaseHTTPRequestHandler, request: dict):
+        model = request.get("model", "stub")
+        sleep(self.first_token_delay)
+
+        if not request.get("stream", False):
+            handler.send_json({"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time()), "model": model, "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(self.tokens)}, "finish_reason": "stop"}]})
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+
+        try:
+            handler.wfile.write(self.chunk(model, {"role": "assistant", "content": ""}))
+            for token in self.tokens:
+                if self.first_token is None:
+                    self.first_token = perf_counter()
+                handler.wfile.write(self.chunk(model, {"content": token}))
+                handler.wfile.flush()
+                sleep(1 / self.token_rate)
+
+            handler.wfile.write(self.chunk(model, {}, "stop"))
+            handler.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.logger.debug("Client closed the stream early")
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Stub LLM listening on {self.host}:{self.port}")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
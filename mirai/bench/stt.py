@@ -0,0 +1,126 @@
+import json
+import multiprocessing
+import os
+import resource
+import numpy as np
+from argparse import ArgumentParser
+from glob import glob
+from queue import Empty
+from time import perf_counter
+from ..recorder import FORMATS, open_recording
+from ..stt import PROFILES, STT, load_profile
+from ..vad import VAD
+
+def load_windows(recordings: str, window: float, limit: int) -> list:
+    # Fixed windows over every recording, keeping only the padded speech inside each one
+    vad = VAD()
+    windows = []
+    paths = [path for extension in FORMATS.values() for path in glob(os.path.join(recordings, f"*{extension}"))]
+    for path in sorted(paths):
+        with open_recording(path) as file:
+            frames = int(window * file.samplerate)
+            while len(windows) < limit:
+                audio = file.read(frames, dtype='float32')
+                if len(audio) == 0:
+                    break
+                if audio.ndim > 1:
+                    audio = audio[:, 0]
+
+                speech = vad.trim(audio)
+                if speech is not None:
+                    windows.append(np.ascontiguousarray(audio[speech[0]:speech[1]]))
+
+    return windows
+
+def run_profile(profile: dict, windows: list, results: multiprocessing.Queue):
+    # Runs in its own process so peak RSS belongs to this profile alone
+    load_start = perf_counter()
+    stt = STT(profile)
+    load_time = perf_counter() - load_start
+
+    latencies = []
+    transcripts = []
+    for audio in windows:
+        start = perf_counter()
+        transcripts.append(stt.transcribe(audio))
+        latencies.append(perf_counter() - start)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((load_time, latencies, transcripts, peak_rss))
+
+def word_error_rate(reference: str, hypothesis: str) -> tuple:
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+
+    distances = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, distances[0] = distances[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, distances[j] = distances[j], min(distances[j] + 1, distances[j - 1] + 1, previous + (ref_word != hyp_word))
+
+    return distances[-1], len(ref)
+
+def main():
+    parser = ArgumentParser(description="Benchmark STT decoding profiles on recorded audio")
+    parser.add_argument('-c', '--config', type=str, default="config.json", help="Configuration file with custom stt_profiles")
+    parser.add_argument('-r', '--recordings', type=str, default="out/recordings", help="Directory of recordings from --record mode")
+    parser.add_argument('-p', '--profiles', nargs='+', help="Profiles to run, defaults to all of them")
+    parser.add_argument('-w', '--window', type=float, default=8.0, help="Utterance window in seconds")
+    parser.add_argument('-n', '--limit', type=int, default=50, help="Maximum number of windows")
+    parser.add_argument('--reference', type=str, default="accurate", help="Profile whose transcripts are used as the WER reference")
+    args = parser.parse_args()
+
+    custom_profiles = {}
+    try:
+        with open(args.config, 'r') as file:
+            custom_profiles = json.load(file).get("stt_profiles", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    names = args.profiles or list(dict.fromkeys([*PROFILES, *custom_profiles]))
+    windows = load_windows(args.recordings, args.window, args.limit)
+    if len(windows) == 0:
+        print(f"No speech found in {args.recordings}")
+        return
+
+    audio_seconds = sum(len(audio) for audio in windows) / 16000
+    print(f"{len(windows)} windows, {audio_seconds:.1f} seconds of speech")
+
+    reports = {}
+    failed = {}
+    for name in names:
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_profile, args=(load_profile(name, custom_profiles), windows, results))
+        process.start()
+
+        # A failed model download or the OOM killer ends the process without a result
+        while name not in reports:
+            alive = process.is_alive()
+            try:
+                reports[name] = results.get(timeout=1.0)
+            except Empty:
+                if not alive:
+                    failed[name] = process.exitcode
+                    break
+        process.join()
+
+    reference = reports.get(args.reference)
+
+    print(f"{'profile':<16}{'load s':>8}{'RTF':>8}{'p50 s':>8}{'p95 s':>8}{'RSS MB':>9}{'WER':>8}")
+    for name, (load_time, latencies, transcripts, peak_rss) in reports.items():
+        wer = "-"
+        if reference is not None and name != args.reference:
+            errors, words = map(sum, zip(*(word_error_rate(ref, hyp) for ref, hyp in zip(reference[2], transcripts))))
+            wer = f"{errors / max(words, 1) * 100:.1f}%"
+
+        print(f"{name:<16}{load_time:>8.2f}{sum(latencies) / audio_seconds:>8.3f}{np.percentile(latencies, 50):>8.3f}{np.percentile(latencies, 95):>8.3f}{peak_rss:>9.0f}{wer:>8}")
+
+    for name, exitcode in failed.items():
+        reason = f"killed by signal {-exitcode}" if exitcode < 0 else f"exit code {exitcode}"
+        print(f"{name:<16} failed ({reason})")
+
+    if reference is not None:
+        print(f"WER is measured against the {args.reference} profile's transcripts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import base64
+import io
+import logging
+import os
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Timer
+from time import perf_counter, sleep
+from PIL import Image
+
+class Picamera2Backend:
+    def __init__(self, size: tuple = (1120, 1120), settle: float = 2.0):
+        self.size = tuple(size)
+        self.settle = settle
+        self.camera = None
+
+    def open(self):
+        # Only needed on the Pi, so the module is imported when the camera is first opened
+        import picamera2
+
+        self.camera = picamera2.Picamera2()
+        self.camera.configure(self.camera.create_still_configuration({"size": self.size}))
+        self.camera.start()
+
+        # Exposure and white balance settle once, not per picture
+        sleep(self.settle)
+
+    def capture(self) -> np.ndarray:
+        return self.camera.capture_array()
+
+    def close(self):
+        if self.camera is not None:
+            self.camera.close()
+            self.camera = None
+
+class OpenCVBackend:
+    def __init__(self, index: int = 0, settle: float = 1.0):
+        self.index = index
+        self.settle = settle
+        self.capture_device = None
+
+    def open(self):
+        import cv2
+
+        self.capture_device = cv2.VideoCapture(self.index)
+        if not self.capture_device.isOpened():
+            raise RuntimeError(f"Could not open camera {self.index}")
+        sleep(self.settle)
+
+    def capture(self) -> np.ndarray:
+        import cv2
+
+        # Drop the frame buffered while idle so the picture is current
+        self.capture_device.grab()
+        ok, frame = self.capture_device.read()
+        if not ok:
+            raise RuntimeError("Could not capture frame")
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        if self.capture_device is not None:
+            self.capture_device.release()
+            self.capture_device = None
+
+class FileBackend:
+    # Stands in for a camera: cycles through image files, or a synthetic gradient without a path
+    def __init__(self, path: str = None, size: tuple = (1120, 1120)):
+        self.path = path
+        self.size = tuple(size)
+        self.files = []
+        self.index = 0
+
+    def open(self):
+        if self.path is None:
+            return
+        if os.path.isdir(self.path):
+            self.files = sorted(os.path.join(self.path, name) for name in os.listdir(self.path) if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp")))
+        else:
+            self.files = [self.path]
+
+    def capture(self) -> np.ndarray:
+        if not self.files:
+            x = np.linspace(0, 255, self.size[0], dtype=np.uint8)
+            y = np.linspace(0, 255, self.size[1], dtype=np.uint8)
+            return np.stack(np.broadcast_arrays(x[None, :], y[:, None], np.uint8(128)), axis=-1)
+
+        path = self.files[self.index % len(self.files)]
+        self.index += 1
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGB"))
+
+    def close(self):
+        pass
+
+BACKENDS = {"picamera2": Picamera2Backend, "opencv": OpenCVBackend, "file": FileBackend}
+
+def create_backend(name: str, source=None, size: tuple = (1120, 1120)):
+    if name == "picamera2":
+        return Picamera2Backend(size)
+    if name == "opencv":
+        return OpenCVBackend(0 if source is None else int(source))
+    if name == "file":
+        return FileBackend(source, size)
+    raise ValueError(f"Unknown camera backend {name}, expected one of {', '.join(BACKENDS)}")
+
+class CameraService:
+    # Owns the camera on one worker thread: opens it ahead of time, captures and encodes without blocking callers
+    def __init__(self, backend, max_size: int = 672, image_format: str = "JPEG", quality: int = 85, rotate: int = 0, keep_warm: bool = False, idle_timeout: float = 30.0):
+        self.logger = logging.getLogger("CameraService")
+        self.backend = backend
+        self.max_size = max_size
+        self.image_format = image_format.upper()
+        self.quality = quality
+        self.rotate = rotate
+        self.keep_warm = keep_warm
+        self.idle_timeout = idle_timeout
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Camera")
+        self.lock = Lock()
+        self.opened = False
+        self.opening = None
+        self.idle_timer = None
+
+        if keep_warm:
+            self.prepare()
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.image_format.lower()}"
+
+    def open(self):
+        if self.opened:
+            return
+        start = perf_counter()
+        self.backend.open()
+        self.opened = True
+        self.logger.info(f"Camera ready in {perf_counter() - start:.2f}s")
+
+    def prepare(self) -> Future:
+        # Starts the sensor in the background, e.g. as soon as a partial transcript mentions a picture
+        with self.lock:
+            if self.opening is None or (self.opening.done() and not self.opened):
+                self.opening = self.executor.submit(self.open)
+            self.touch()
+            return self.opening
+
+    def touch(self):
+        if self.keep_warm:
+            return
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+        self.idle_timer = Timer(self.idle_timeout, self.idle)
+        self.idle_timer.daemon = True
+        self.idle_timer.start()
+
+    def idle(self):
+        self.executor.submit(self.release)
+
+    def release(self):
+        with self.lock:
+            if self.opened:
+                self.backend.close()
+                self.opened = False
+                self.opening = None
+                self.logger.info("Camera closed after idling")
+
+    def encode(self, frame: np.ndarray) -> str:
+        image = Image.fromarray(frame)
+        if self.rotate:
+            image = image.rotate(self.rotate, expand=True)
+
+        # The vision model downsamples anyway; sending it a smaller JPEG or WebP saves most of the upload
+        image.thumbnail((self.max_size, self.max_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+        buffer = io.BytesIO()
+        if self.image_format == "PNG":
+            image.save(buffer, format="PNG")
+        else:
+            image.save(buffer, format=self.image_format, quality=self.quality)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+    def shoot(self) -> tuple:
+        start = perf_counter()
+        self.open()
+        frame = self.backend.capture()
+        picture = self.encode(frame)
+        self.logger.info(f"Captured {frame.shape[1]}x{frame.shape[0]}, sent {len(picture) * 3 // 4} bytes in {perf_counter() - start:.2f}s")
+        return (self.mime_type, picture)
+
+    def request(self) -> Future:
+        # Resolves to (mime type, base64 data)
+        with self.lock:
+            self.touch()
+            return self.executor.submit(self.shoot)
+
+    def close(self):
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+        self.executor.submit(self.backend.close)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,145 @@
+import json
+import logging
+from collections import OrderedDict
+from threading import Lock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from langchain_core.messages import HumanMessage, SystemMessage
+
+def message_text(message) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(part.get("text", "") for part in message.content if isinstance(part, dict))
+
+class TokenCounter:
+    # Counts with the llama.cpp server tokenizer, falling back to an estimate when it has no tokenize endpoint
+    def __init__(self, base_url: str = None, tokenize=None, overhead: int = 4, image_tokens: int = 768, cache_size: int = 4096):
+        self.logger = logging.getLogger("TokenCounter")
+        self.base_url = base_url
+        self.tokenize = tokenize
+        self.overhead = overhead
+        self.image_tokens = image_tokens
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = Lock()
+
+    def count_text(self, text: str) -> int:
+        with self.lock:
+            if text in self.cache:
+                self.cache.move_to_end(text)
+                return self.cache[text]
+
+        if self.tokenize is not None:
+            count = len(self.tokenize(text))
+        elif self.base_url is not None:
+            try:
+                request = Request(f"{self.base_url}/extras/tokenize/count", data=json.dumps({"input": text}).encode(), headers={"Content-Type": "application/json"})
+                with urlopen(request, timeout=2.0) as response:
+                    count = json.load(response)["count"]
+            except HTTPError as e:
+                self.logger.warning(f"Server has no tokenize endpoint, estimating token counts: {e}")
+                self.base_url = None
+                count = len(text) // 4 + 1
+            except Exception as e:
+                # The server may still be starting, so estimate this one without caching it
+                self.logger.debug(f"Tokenizer unreachable: {e}")
+                return len(text) // 4 + 1
+        else:
+            count = len(text) // 4 + 1
+
+        with self.lock:
+            self.cache[text] = count
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return count
+
+    def count(self, message) -> int:
+        images = 0 if isinstance(message.content, str) else sum(1 for part in message.content if isinstance(part, dict) and part.get("type") == "image_url")
+        return self.count_text(message_text(message)) + self.overhead + images * self.image_tokens
+
+SUMMARY_INSTRUCTIONS = "Condense the conversation below into a short summary of the facts, names, preferences and open requests worth remembering. Reply with the summary only."
+
+class ContextManager:
+    # Keeps the prompt under a token budget without changing its prefix every turn, so llama.cpp can reuse its KV cache
+    def __init__(self, counter: TokenCounter, budget: int, system_prompt: str = "", summarizer=None, low_water: float = 0.6, summary_tokens: int = 256):
+        self.logger = logging.getLogger("ContextManager")
+        self.counter = counter
+        self.budget = budget
+        self.summarizer = summarizer
+        self.low_water = low_water
+        self.summary_tokens = summary_tokens
+        self.system_prompt = system_prompt
+
+        # History is cut in large steps at a fixed anchor message, then left alone until it overflows again
+        self.anchor = None
+        self.summary = ""
+        self.pending = []
+        self.lock = Lock()
+
+    def key(self, message) -> tuple:
+        return (message.type, message_text(message))
+
+    def window_start(self, messages: list) -> int:
+        if self.anchor is None:
+            return 0
+        for i, message in enumerate(messages):
+            if self.key(message) == self.anchor:
+                return i
+        return 0
+
+    def fit(self, messages: list) -> list:
+        with self.lock:
+            window = messages[self.window_start(messages):]
+            fixed = self.counter.count_text(self.system_prompt) + self.counter.overhead + (self.counter.count_text(self.summary) + self.counter.overhead if self.summary else 0)
+            counts = [self.counter.count(message) for message in window]
+            total = fixed + sum(counts)
+
+            if total > self.budget:
+                # Drop down to the low water mark, always keeping the newest message and starting on a user turn
+                drop = 0
+                while drop < len(window) - 1 and (total > self.budget * self.low_water or window[drop].type != "human"):
+                    total -= counts[drop]
+                    drop += 1
+
+                if self.summarizer is not None:
+                    self.pending.extend(window[:drop])
+                window = window[drop:]
+                self.anchor = self.key(window[0])
+                self.logger.info(f"Context over {self.budget} tokens, rolled {drop} messages out, {total} tokens kept")
+
+            if self.summary:
+                return [SystemMessage(content=f"Summary of the earlier conversation: {self.summary}")] + window
+            return window
+
+    def summarize(self):
+        # Run when the assistant is idle; the new summary becomes part of the stable prefix from the next turn
+        with self.lock:
+            if self.summarizer is None or len(self.pending) == 0:
+                return
+            pending = self.pending
+            self.pending = []
+            previous = self.summary
+
+        # Only the most recent rolled out messages that fit in half the budget are read
+        batch = []
+        tokens = 0
+        for message in reversed(pending):
+            tokens += self.counter.count(message)
+            if tokens > self.budget // 2:
+                break
+            batch.insert(0, message)
+
+        transcript = "\n".join(f"{message.type}: {message_text(message)}" for message in batch)
+        request = [SystemMessage(content=SUMMARY_INSTRUCTIONS), HumanMessage(content=f"Previous summary: {previous or 'none'}\n\nConversation:\n{transcript}")]
+
+        try:
+            summary = self.summarizer(request, self.summary_tokens).strip()
+        except Exception as e:
+            self.logger.error(f"Failed to summarize rolled out history: {e}")
+            with self.lock:
+                self.pending = pending + self.pending
+            return
+
+        with self.lock:
+            self.summary = summary
+        self.logger.info(f"Summarized {len(batch)} messages into {self.counter.count_text(summary)} tokens")
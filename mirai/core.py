@@ -1,97 +1,87 @@
-import base64
 import logging
-import io
-from PIL import Image
 import json
 import numpy as np
-from queue import Full, Empty
 import multiprocessing
 import multiprocessing.process
-import os
-import cv2
-import picamera2
-from datetime import datetime
-from threading import Thread
-from soundfile import SoundFile
-from time import time, sleep
+from itertools import count
+from threading import Event, Lock, Thread
 from argparse import ArgumentParser
+from .audiobus import AudioBus
+from .camera import CameraService, create_backend
+from .llama import LlamaServer, LocalLlama
 from .mic import Microphone
-from .model import Model
-from .stt import STT
-from .ui import UI
-
-def audio_listener(mic_name: str, audio_queue: multiprocessing.Queue, shared_state, recording: bool = False):
-    if recording:
-        os.makedirs('./out/recordings', exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_filename = os.path.join('./out/recordings', f'recording_{timestamp}.flac')
-        file = SoundFile(output_filename, mode='w', samplerate=16000, channels=1, format='FLAC')
-    
-    microphone = Microphone(mic_name)
-
-    while shared_state["running"]:
+from .recorder import Recorder
+from .stt import load_profile
+from .startup import Startup
+from .supervisor import STTSupervisor
+from .segmenter import SentenceSegmenter
+from .trace import MetricsServer, Tracer
+from .tts_cache import PCMCache
+from .vad import VAD
+
+def audio_listener(mic_name: str, audio_bus: AudioBus, running, recording: bool = False, chunk_duration: float = 0.5, native_rate: bool = False, tracer: Tracer = None, record_options: dict = None):
+    logger = logging.getLogger("AudioListener")
+
+    # Benchmarks hand in an already built stand-in with the same read() interface
+    if isinstance(mic_name, str):
+        microphone = Microphone(mic_name, native_rate=native_rate)
+    else:
+        microphone = mic_name
+
+    # Pulled from the ring buffer in place, so capture never allocates per chunk
+    chunk_frames = int(chunk_duration * microphone.target_sr)
+    capture_buffer = np.empty(chunk_frames, dtype=np.float32)
+    overruns = 0
+
+    # Encoding and flushing happen on the recorder's thread; the capture loop only copies into its buffer
+    recorder = Recorder(samplerate=microphone.target_sr, chunk_frames=chunk_frames, **(record_options or {})) if recording else None
+    dropped = 0
+
+    while running.is_set():
         try:
-            audio_clip = microphone.record(0.5)
+            audio_clip = microphone.read(chunk_frames, out=capture_buffer, timeout=1.0)
+            if audio_clip is None:
+                continue
+
+            if microphone.overruns != overruns:
+                logger.warning(f"Capture overrun, {microphone.overruns - overruns} frames dropped ({microphone.input_overflows} device overflows)")
+                if tracer is not None:
+                    tracer.emit(None, "capture_overrun", dropped=microphone.overruns - overruns, device_overflows=microphone.input_overflows)
+                overruns = microphone.overruns
             
-            if recording:
-                file.write(audio_clip)
-                file.flush()
+            if recorder is not None:
+                recorder.write(audio_clip)
+                if recorder.dropped != dropped:
+                    logger.warning(f"Recorder behind, {recorder.dropped - dropped} chunks not recorded")
+                    if tracer is not None:
+                        tracer.emit(None, "record_dropped", dropped=recorder.dropped - dropped, total=recorder.dropped)
+                    dropped = recorder.dropped
 
-            if shared_state["listening"]:
-                try:
-                    audio_queue.put_nowait(audio_clip)
-                except Full:
-                    shared_state["listening"] = False
+            # Always published; the invoker marks utterances by cursor
+            audio_bus.write(audio_clip)
 
         except KeyboardInterrupt:
             break
 
-    if recording:
-        file.close() 
+    microphone.close()
 
-def transcription_listener(submit_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue):
-    try:
-        stt = STT()
-
-        while True:
-            try:
-                submitted_audio, duration = submit_queue.get()
-                proc_start = time()
-                text = stt.transcribe(submitted_audio)
-                result_queue.put_nowait(text)
-                proc_end = time()
-
-                print(f"Whisper took: {proc_end - proc_start:.3f} seconds for {duration:.3f} seconds audio; Performance is {duration / (proc_end - proc_start) * 100:.3f}% realtime")
-            except Empty:
-                sleep(0.5)
-                continue
-    except KeyboardInterrupt:
-        pass
+    if recorder is not None:
+        recorder.close()
 
 class MirAI:
-    def __init__(self, manager, voice_path: str, microphone: str, llm_path: str, record_mode: bool = False, config_path: str = 'config.json'):
+    def __init__(self, voice_path: str, microphone: str, llm_path: str, record_mode: bool = False, config_path: str = 'config.json', audio_sink=None):
         self.logger =logging.getLogger("MirAI")
 
-        self.shared_state = manager.dict()
-        self.shared_state["running"] = True
-        self.shared_state["listening"] = False
+        # Plain shared flags, readable from any process without a round trip to a Manager
+        self.running = multiprocessing.Event()
+        self.running.set()
+        self.listening = multiprocessing.Event()
         self.transcribed = ""
+        self.partial_transcript = ""
         self.response_buffer = ""
 
-        self.audio_queue = multiprocessing.Queue(maxsize=60)
-        self.listener_thread = multiprocessing.Process(target=audio_listener, args=(microphone, self.audio_queue, self.shared_state, record_mode))
-
-        self.transcription_queue = multiprocessing.Queue(maxsize=1)        
-
-        self.task1q = multiprocessing.Queue(maxsize=1)
-        self.task2q = multiprocessing.Queue(maxsize=1)
-
-        self.task1_thread = multiprocessing.Process(target=transcription_listener, args=(self.task1q, self.transcription_queue))
-        self.task2_thread = multiprocessing.Process(target=transcription_listener, args=(self.task2q, self.transcription_queue))
-
-        self.invoker_thread = Thread(target=MirAI.invoker_thread, args=(self,))
-
         default_picture_phrases = ["take a picture"]
+        default_prewarm_phrases = ["Cheat mode deactivated, cannot use picture data.", "Could not open camera!", "Taking picture now!", "Could not capture frame!"]
 
         base_host = "127.0.0.1"
         base_port = 8000
@@ -101,6 +91,7 @@ class MirAI:
 
         prompt = "You are a useful AI assistant. Please help the user."
 
+        data = {}
         try:
             with open(config_path, 'r') as file:
                 data = json.load(file)
@@ -118,160 +109,332 @@ class MirAI:
             self.logger.error(f"Failed to load JSON File: {e}")
             self.picture_strings = default_picture_phrases
 
-        self.model = Model(llm_path, voice_path, self, prompt=prompt, cheat_host=cheat_host, cheat_port=cheat_port, host=base_host, port=base_port)
-        
-        # Start threads at end
+        # Turn IDs tie together events from every process into per-stage spans
+        self.tracer = Tracer(data.get("trace_file", "trace.jsonl"))
+        self.tracer.start()
+        self.startup = Startup(self.tracer)
+        self.metrics = None
+        if data.get("metrics_port") is not None:
+            self.metrics = MetricsServer(self.tracer, port=data["metrics_port"])
+        self.turns = count(1)
+        self.turn = None
+
+        # Opens the microphone at 16kHz when supported instead of resampling from 44.1kHz
+        native_rate = data.get("mic_native_rate", False)
+
+        # Capture publishes into shared memory, everything downstream passes sample offsets
+        self.audio_bus = AudioBus(data.get("audio_bus_seconds", 60.0))
+        self.chunk_duration = 0.1
+        self.utterance_start = None
+        self.release_cursor = 0
+
+        # Recording goes through a bounded buffer to a writer thread, so disk stalls never delay capture
+        record_options = {
+            "format": data.get("record_format", "flac"),
+            "flush_interval": data.get("record_flush_interval", 5.0),
+            "buffer_seconds": data.get("record_buffer_seconds", 30.0),
+            "rotate_seconds": data["record_rotate_minutes"] * 60 if data.get("record_rotate_minutes") else None,
+            "rotate_bytes": int(data["record_rotate_mb"] * 1024 * 1024) if data.get("record_rotate_mb") else None,
+        }
+
+        self.listener_thread = multiprocessing.Process(target=audio_listener, args=(microphone, self.audio_bus, self.running, record_mode, self.chunk_duration, native_rate, self.tracer, record_options))
+
+        # Partial hypotheses are decoded while the user is still talking
+        self.stt_streaming = data.get("stt_streaming", True)
+        self.stream_interval = data.get("stt_stream_interval", 1.0)
+        self.streamed_start = None
+
+        # Trims silence before Whisper and optionally ends (or starts) utterances hands-free
+        self.vad = VAD(self.audio_bus.samplerate, hangover=data.get("vad_hangover", 0.8))
+        self.vad_trim = data.get("vad_trim", True)
+        self.vad_auto_start = data.get("vad_auto_start", False)
+        self.vad_auto_end = data.get("vad_auto_end", False) or self.vad_auto_start
+        self.vad_barge_in = data.get("vad_barge_in", False)
+        self.vad_cursor = 0
+
+        # One resident Whisper worker by default, a warm standby costs a second model in memory
+        profile = load_profile(data.get("stt_profile", "balanced"), data.get("stt_profiles"))
+        self.stt = STTSupervisor(self.audio_bus, profile, self.tracer, standby=data.get("stt_standby", False), stream_interval=self.stream_interval, deadline_factor=data.get("stt_deadline_factor", 2.0), deadline_min=data.get("stt_deadline_min", 5.0))
+        self.stream_job = None
+
+        # The camera is opened ahead of time and encodes off the invoker thread
+        backend = create_backend(data.get("camera_backend", "picamera2"), data.get("camera_source"), data.get("camera_size", (1120, 1120)))
+        self.camera = CameraService(backend, data.get("camera_max_size", 672), data.get("camera_format", "JPEG"), data.get("camera_quality", 85), data.get("camera_rotate", 90), data.get("camera_keep_warm", False), data.get("camera_idle_timeout", 30.0))
+
+        # Key presses and releases wake the invoker; partials and speech detection block on their own sources
+        self.wakeup = Event()
+        self.invoker_thread = Thread(target=MirAI.invoker_thread, args=(self,))
+        self.partial_thread = Thread(target=MirAI.partial_listener, args=(self,), daemon=True)
+        self.speech_thread = Thread(target=MirAI.speech_listener, args=(self,), daemon=True)
+
+        # Filled in by the startup tasks; until then the UI shows what is still loading
+        self.llm = None
+        self.tts = None
+        self.model = None
+        self.load_lock = Lock()
+        self.closed = False
+
+        self.voice_path = voice_path
+        self.audio_sink = audio_sink
+        self.llm_path = llm_path
+        self.llm_backend = data.get("llm_backend", "server")
+        self.config = data
+        self.prewarm_phrases = data.get("tts_prewarm_phrases", default_prewarm_phrases)
+        self.prompt = prompt
+        self.base_host = base_host
+        self.base_port = base_port
+        self.cheat_host = cheat_host
+        self.cheat_port = cheat_port
+
+        # Child processes fork first, before any loading thread exists, so none inherits a half-held import lock.
+        # Whisper and the llama server then load in their own processes while Piper and LangChain load here
         self.listener_thread.start()
-        self.task1_thread.start()
-        self.task2_thread.start()
-        
-        self.active_task_queue = self.task1q
-        self.active_thread = self.task1_thread
-        self.backup_task_queue = self.task2q
-        self.backup_thread = self.task2_thread
-        
-        self.invoker_thread.start()
-
-    def transcribe_submit(self, submit_data):
-        # Submit with timeout
-        self.active_task_queue.put(submit_data)
-        start_time = time()
-        got_result = False
-
-        # Wait for first result
-        while time() - start_time < 20:
-            try:
-                result = self.transcription_queue.get(timeout=1)
-                got_result = True
-                break
-            except Empty:
-                continue
-                    
-        if not got_result:
-            self.backup_task_queue.put(submit_data)
-            start_time = time()
-
-            # Now restart the secondary process                        
-            self.active_thread.terminate()
-            self.active_thread.join()
+        self.stt.start()
+        if llm_path is not None and self.llm_backend != "local":
+            self.llm = LlamaServer(llm_path, base_host, base_port, data.get("llm_options"), prompt)
+            self.llm.start()
 
-            self.active_thread = multiprocessing.Process(target=transcription_listener, args=(self.task1q, self.transcription_queue))
-            self.active_thread.start()
-
-            # Swap our "active" and "background" while Whisper loads
-            self.active_task_queue, self.backup_task_queue = self.backup_task_queue, self.active_task_queue
-            self.active_thread, self.backup_thread = self.backup_thread, self.active_thread
-
-            # Wait for results
-            while time() - start_time < 20:
-                try:
-                    result = self.transcription_queue.get(timeout=1)
-                    got_result = True
-                    break
-                except Empty:
-                    continue
-
-            if not got_result:
-                raise RuntimeError("Whisper failed twice somehow!")
-        
-        return result
+        self.startup.add("whisper", self.load_whisper)
+        self.startup.add("llm", self.load_llm)
+        self.startup.add("voice", self.load_voice)
+        self.startup.add("model", self.load_model)
 
+        self.invoker_thread.start()
+        if self.stt_streaming:
+            self.partial_thread.start()
+        if self.vad_auto_end:
+            self.speech_thread.start()
+
+    def keep(self, attribute: str, component):
+        # A component that finishes loading after shutdown is closed instead of kept
+        with self.load_lock:
+            if not self.closed:
+                setattr(self, attribute, component)
+                return
+        component.close()
+        raise RuntimeError("shut down while loading")
+
+    def load_whisper(self):
+        if not self.stt.active.ready.wait(self.stt.load_timeout):
+            raise RuntimeError(f"Whisper did not load within {self.stt.load_timeout:.0f}s")
+
+    def load_llm(self):
+        if self.llm_path is not None and self.llm_backend == "local":
+            self.keep("llm", LocalLlama(self.llm_path, self.config.get("llm_options"), self.prompt))
+
+        if self.llm is not None and not self.llm.wait_ready(300.0):
+            raise RuntimeError("LLM did not become ready within 300s")
+
+    def load_voice(self):
+        from .tts import TTS
+
+        # Fixed prompts and repeated short replies play from cached PCM instead of going through Piper
+        tts_cache = PCMCache(self.config.get("tts_cache_dir", "tts_cache"), int(self.config.get("tts_cache_mb", 32) * 1024 * 1024))
+        self.keep("tts", TTS(self.voice_path, self.audio_sink, self.tracer, cache=tts_cache))
+        self.tts.prewarm(self.prewarm_phrases)
+
+    def load_model(self):
+        # LangChain imports while Piper loads; the in-process model has to exist before its tokenizer is used
+        from .history import ChatHistoryStore
+        from .model import Model
+
+        self.startup.require("voice")
+        if self.llm_backend == "local":
+            self.startup.require("llm")
+
+        data = self.config
+
+        # The first clause of a reply is spoken at a comma or after a few words, the rest by sentence
+        segmenter = SentenceSegmenter(data.get("tts_first_clause_words", 10), data.get("tts_min_clause_words", 4))
+
+        history = ChatHistoryStore(data.get("history_dir", "history"), data.get("history_max_messages", 200))
+
+        self.keep("model", Model(self.llm, self.tts, self, prompt=self.prompt, cheat_host=self.cheat_host, cheat_port=self.cheat_port, host=self.base_host, port=self.base_port, tracer=self.tracer, segmenter=segmenter, history=history, session_id=data.get("session_id", "default"), context_budget=data.get("context_budget", 3072), cheat_context_budget=data.get("cheat_context_budget", 6144), cheat_first_token_deadline=data.get("cheat_first_token_deadline", 4.0), cheat_probe_interval=data.get("cheat_probe_interval", 10.0), cheat_picture_deadline=data.get("cheat_picture_deadline", 30.0)))
+
+    def close_components(self):
+        with self.load_lock:
+            self.closed = True
+
+        # The model owns the voice and the LLM once it exists
+        if self.model is not None:
+            self.model.close()
+            return
+        if self.tts is not None:
+            self.tts.close()
+        if self.llm is not None:
+            self.llm.close()
+
+    def transcribe_submit(self, start: int, end: int, duration: float, turn: int = None) -> str:
+        job = self.stream_job if self.streamed_start == start else None
+        self.stream_job = None
+        return self.stt.transcribe(start, end, duration, job=job, turn=turn)
+
+    def partial_listener(self):
+        while self.running.is_set():
+            for job, text in self.stt.partials(wait=0.5):
+                if job == self.stream_job:
+                    self.partial_transcript = text
+                    if self.model is not None and self.model.cheat_mode and self.wants_picture(text):
+                        self.camera.prepare()
+
+    def detect_speech(self):
+        cursor = self.audio_bus.write_cursor
+        if not self.audio_bus.is_valid(self.vad_cursor):
+            self.vad.reset(cursor)
+            self.vad_cursor = cursor
+
+        consumed, events = self.vad.feed(self.audio_bus.view(self.vad_cursor, cursor))
+        self.vad_cursor += consumed
+
+        for event, position in events:
+            listening = self.listening.is_set()
+            model = self.model
+            idle = model is not None and not model.busy and model.queue.empty()
+            if event == "start" and self.vad_auto_start and not listening and (idle or self.vad_barge_in):
+                self.logger.info("Speech detected, listening")
+                self.start_listening(max(self.audio_bus.oldest(), position - self.vad.pad))
+            elif event == "end" and listening:
+                self.logger.info("Silence detected, ending utterance")
+                self.toggle_listening()
+
+    def speech_listener(self):
+        # Runs the VAD as soon as each chunk lands on the bus
+        frames = int(self.chunk_duration * self.audio_bus.samplerate)
+        while self.running.is_set():
+            self.audio_bus.wait(self.vad_cursor + frames, timeout=0.5)
+            self.detect_speech()
 
     def invoker_thread(self):
         print("MirAI starting...")
 
-        while self.shared_state["running"]:
+        while self.running.is_set():
             try:
-                sleep(0.1)
-                if not self.shared_state["listening"] and self.audio_queue.qsize() > 0:
-                    sleep(0.5)
-                    # Obtain all audio, concat into a buffer, submit
-                    array_of_arrays = []
-                    for _ in range(0, self.audio_queue.qsize()):
-                        array_of_arrays.append(self.audio_queue.get_nowait())
-                    
-                    final_buffer = np.concatenate(array_of_arrays)
-                    duration = 0.5 * len(array_of_arrays)
-
-                    result = self.transcribe_submit((final_buffer, duration))
+                # Woken at once by a press or release, otherwise only for worker supervision
+                self.wakeup.wait(0.5)
+                self.wakeup.clear()
+                self.stt.check()
+
+                if self.listening.is_set() and self.utterance_start is not None:
+                    if self.stt_streaming and self.streamed_start != self.utterance_start:
+                        self.streamed_start = self.utterance_start
+                        self.partial_transcript = ""
+                        self.stream_job = self.stt.stream(self.utterance_start, self.turn)
+                elif not self.listening.is_set() and self.utterance_start is not None:
+                    start = self.utterance_start
+                    turn = self.turn
+                    self.utterance_start = None
+
+                    # Wait for the chunk that contains the release, rather than a fixed sleep
+                    frames = int(self.chunk_duration * self.audio_bus.samplerate)
+                    end = self.audio_bus.wait(self.release_cursor + frames, timeout=1.0)
+                    self.tracer.emit(turn, "audio_drained")
+
+                    if start < end - self.audio_bus.capacity:
+                        self.logger.warning(f"Utterance longer than the audio bus, keeping the last {self.audio_bus.capacity / self.audio_bus.samplerate:.0f} seconds")
+                        start = end - self.audio_bus.capacity
+
+                    streamed = self.stt_streaming and self.streamed_start == start
+                    if self.vad_trim and end > start:
+                        speech = self.vad.trim(self.audio_bus.view(start, end))
+
+                        if speech is None:
+                            self.logger.info("No speech in utterance, skipping transcription")
+                            end = start
+                        elif streamed:
+                            # The streaming worker is keyed on the start, so only the trailing silence goes
+                            end = start + speech[1]
+                        else:
+                            start, end = start + speech[0], start + speech[1]
+
+                    if end <= start:
+                        if streamed:
+                            self.stt.cancel(self.stream_job)
+                            self.stream_job = None
+                        self.partial_transcript = ""
+                        continue
+
+                    duration = (end - start) / self.audio_bus.samplerate
+
+                    result = self.transcribe_submit(start, end, duration, turn)
+                    self.tracer.emit(turn, "transcript_ready", audio_seconds=duration)
+                    self.partial_transcript = ""
+
+                    # Spoken before the model finished loading, the turn waits for it rather than being lost
+                    while self.startup.status()["model"] == "loading" and self.running.is_set():
+                        self.startup.wait("model", 0.5)
+                    if self.model is None:
+                        self.logger.error("Model is not loaded, dropping the transcript")
+                        continue
 
                     picture_taken = False
                     picture = None
                     
-                    # Check for camera phrase
-                    for sub in self.picture_strings:
-                        if sub.lower() in result.lower():
-                            picture_taken, picture = self.take_picture_pi()
-                    
+                    # Check for camera phrase; the model only waits on the picture if cheat mode can use it
+                    if self.wants_picture(result):
+                        picture_taken = True
+                        if self.model.cheat_mode:
+                            picture = self.camera.request()
 
                     # Submit to LLM
                     self.transcribed = result
                     self.response_buffer = ""
                     print(result)
-                    self.model.queue.put_nowait((result, picture_taken, picture if picture_taken else None))
+                    self.model.queue.put_nowait((result, picture_taken, picture, turn))
 
             except (KeyboardInterrupt, BrokenPipeError):
                 break
-        
-        self.active_thread.terminate()
-        self.active_thread.join()
-
-        self.backup_thread.terminate()
-        self.backup_thread.join()
-
-        self.model.close()
-    
-    def take_picture_pi(self):
-        camera = picamera2.Picamera2()
-        camera.configure(camera.create_still_configuration({"size": (1120, 1120)}))
-
-        camera.start()
-        sleep(2)
 
-        frame = camera.capture_array()
-        camera.close()
+        # Both read from the bus and the workers, so they stop before either is torn down
+        for thread in (self.partial_thread, self.speech_thread):
+            if thread.is_alive():
+                thread.join()
 
-        buffer = io.BytesIO()
+        self.stt.close()
 
-        image = Image.fromarray(frame).rotate(90)
-        image.save(buffer, format='PNG')
-        picture = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        self.listener_thread.join()
+        self.audio_bus.close()
 
-        return (True, picture)
+        self.close_components()
+        self.camera.close()
 
-    def take_picture(self):
-        try:
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                self.model.tts.say("Could not open camera!")
-                return (False, None)
-
-            cv2.waitKey(5000)
-            self.model.tts.say("Taking picture now!")
-
-            ret, frame = cap.read()
-
-            if not ret:
-                self.model.tts.say("Could not capture frame!")
-                return (False, None)
-
-
-            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            buffer = io.BytesIO()
-            image.save(buffer, format = "PNG")
-            picture = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            return (True, picture)
-        except Exception as e:
-            print(e)
-            return (False, None)
+        if self.metrics is not None:
+            self.metrics.close()
+        self.tracer.close()
+    
+    def wants_picture(self, text: str) -> bool:
+        return any(phrase.lower() in text.lower() for phrase in self.picture_strings)
+
+    def start_listening(self, start: int = None):
+        # Talking over the assistant cancels the rest of its reply
+        if self.model is not None:
+            self.model.interrupt()
+        self.turn = next(self.turns)
+        self.listening.set()
+        self.utterance_start = self.audio_bus.write_cursor if start is None else start
+        self.wakeup.set()
+
+    def stop_listening(self):
+        self.release_cursor = self.audio_bus.write_cursor
+        self.tracer.emit(self.turn, "key_release")
+        self.listening.clear()
+        self.wakeup.set()
 
     def toggle_listening(self):
-        self.shared_state["listening"] = not self.shared_state["listening"]
+        if self.listening.is_set():
+            self.stop_listening()
+        else:
+            self.start_listening()
+
+    def shutdown(self):
+        self.running.clear()
+        self.wakeup.set()
 
     def toggle_cheat_mode(self):
+        if self.model is None:
+            self.logger.info("Model still loading, cheat mode unchanged")
+            return
         self.logger.info(f"Cheat Mode Set: {not self.model.cheat_mode}")
-        self.model.cheat_mode = not self.model.cheat_mode
+        self.model.set_cheat_mode(not self.model.cheat_mode)
 
 def main():
     logging.basicConfig(filename="mirai.log", level=logging.DEBUG)
@@ -287,8 +450,10 @@ def main():
 
     args = parser.parse_args()
 
-    with multiprocessing.Manager() as manager: 
-        mirai = MirAI(manager, args.voice, args.microphone, args.llm, args.record, args.config)
-        
-        ui = UI()        
-        ui.run_customtkinter(mirai, args.images, "MirAI")
\ No newline at end of file
+    mirai = MirAI(args.voice, args.microphone, args.llm, args.record, args.config)
+
+    # Imported after the loading threads are running, so the window appears while they work
+    from .ui import UI
+
+    ui = UI()
+    ui.run_customtkinter(mirai, args.images, "MirAI")
\ No newline at end of file
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import re
+from threading import Lock, Thread
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+def tail_lines(path: str, count: int, block_size: int = 65536) -> list:
+    # Reads backwards from the end so loading recent history does not depend on its total length
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+
+    lines = [line for line in data.split(b"\n") if line.strip()]
+    return lines[-count:] if count > 0 else []
+
+class JSONLChatMessageHistory(BaseChatMessageHistory):
+    # One JSON message per line, appended as it happens; only the most recent messages are ever held in memory
+    def __init__(self, path: str, max_messages: int = 200, compact_bytes: int = 1024 * 1024):
+        self.logger = logging.getLogger("ChatHistory")
+        self.path = path
+        self.archive_path = path[:-len(".jsonl")] + ".archive.jsonl" if path.endswith(".jsonl") else path + ".archive"
+        self.max_messages = max_messages
+        self.compact_bytes = compact_bytes
+        self.lock = Lock()
+        self.loaded = None
+        self.compactor = None
+
+    def load(self) -> list:
+        if self.loaded is None:
+            self.loaded = []
+            if os.path.exists(self.path):
+                records = []
+                for line in tail_lines(self.path, self.max_messages):
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        self.logger.warning(f"Skipping corrupt history line in {self.path}: {e}")
+                self.loaded = messages_from_dict(records)
+        return self.loaded
+
+    @property
+    def messages(self) -> list:
+        with self.lock:
+            return list(self.load())
+
+    def add_messages(self, messages: list):
+        lines = "".join(json.dumps(message_to_dict(message)) + "\n" for message in messages)
+
+        with self.lock:
+            loaded = self.load()
+            loaded.extend(messages)
+            del loaded[:-self.max_messages]
+
+            with open(self.path, 'a') as file:
+                file.write(lines)
+            size = os.path.getsize(self.path)
+
+        if size > self.compact_bytes and (self.compactor is None or not self.compactor.is_alive()):
+            self.compactor = Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def add_message(self, message: BaseMessage):
+        self.add_messages([message])
+
+    def compact(self):
+        # Older messages move to the archive so the live file stays small; nothing is deleted
+        with self.lock:
+            with open(self.path, 'r') as file:
+                lines = file.readlines()
+            if len(lines) <= self.max_messages:
+                return
+
+            with open(self.archive_path, 'a') as file:
+                file.writelines(lines[:-self.max_messages])
+
+            temporary = self.path + ".tmp"
+            with open(temporary, 'w') as file:
+                file.writelines(lines[-self.max_messages:])
+            os.replace(temporary, self.path)
+
+        self.logger.info(f"Compacted {self.path}, archived {len(lines) - self.max_messages} messages")
+
+    def clear(self):
+        with self.lock:
+            self.loaded = []
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+class ChatHistoryStore:
+    # Session ID -> history, each session in its own file under one directory
+    def __init__(self, directory: str = "history", max_messages: int = 200, compact_bytes: int = 1024 * 1024):
+        self.directory = directory
+        self.max_messages = max_messages
+        self.compact_bytes = compact_bytes
+        self.sessions = {}
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        with self.lock:
+            if session_id not in self.sessions:
+                filename = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id) + ".jsonl"
+                self.sessions[session_id] = JSONLChatMessageHistory(os.path.join(self.directory, filename), self.max_messages, self.compact_bytes)
+            return self.sessions[session_id]
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".webp", ".png", ".jpg", ".jpeg", ".gif", ".bmp")
+
+class ImageLibrary:
+    # Lists the folder up front but decodes one image at a time, through a thumbnail cache on disk and a small LRU
+    def __init__(self, folder: str, size: tuple, cache_dir: str = None, capacity: int = 3):
+        self.logger = logging.getLogger("ImageLibrary")
+        self.folder = folder
+        self.size = tuple(size)
+        self.cache_dir = cache_dir or os.path.join(folder, ".thumbnails")
+        self.capacity = capacity
+
+        self.paths = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.decoded = OrderedDict()
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ImageLibrary")
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            self.logger.warning(f"Thumbnail cache disabled: {e}")
+            self.cache_dir = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def thumbnail_path(self, path: str) -> str:
+        # Editing or replacing the source changes its mtime or size, and so the key
+        stat = os.stat(path)
+        key = hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{self.size[0]}x{self.size[1]}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def decode(self, path: str) -> Image.Image:
+        thumbnail = self.thumbnail_path(path) if self.cache_dir is not None else None
+        if thumbnail is not None and os.path.exists(thumbnail):
+            with Image.open(thumbnail) as image:
+                image.load()
+                return image
+
+        with Image.open(path) as image:
+            image = image.convert("RGBA").resize(self.size, Image.Resampling.LANCZOS)
+
+        if thumbnail is not None:
+            try:
+                image.save(thumbnail, format="PNG")
+            except OSError as e:
+                self.logger.warning(f"Could not cache thumbnail for {path}: {e}")
+        return image
+
+    def get(self, path: str) -> Image.Image:
+        with self.lock:
+            if path in self.decoded:
+                self.decoded.move_to_end(path)
+                return self.decoded[path]
+
+        try:
+            image = self.decode(path)
+        except Exception as e:
+            print(f"Error loading {os.path.basename(path)}: {e}")
+            with self.lock:
+                if path in self.paths:
+                    self.paths.remove(path)
+            return None
+
+        with self.lock:
+            self.decoded[path] = image
+            while len(self.decoded) > self.capacity:
+                self.decoded.popitem(last=False)
+        return image
+
+    def prefetch(self, path: str):
+        self.executor.submit(self.get, path)
+
+    def choose(self, exclude: str = None) -> str:
+        with self.lock:
+            choices = [path for path in self.paths if path != exclude] or self.paths
+            return random.choice(choices) if choices else None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import numpy as np
+from subprocess import Popen, STDOUT, TimeoutExpired
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from urllib.request import Request, urlopen
+
+DEFAULT_OPTIONS = {
+    "n_threads": 4,
+    "n_batch": 512,
+    "n_ctx": 4096,
+    "use_mlock": False,
+    "use_mmap": True,
+    "prompt_cache": False,
+    "kv_state_file": None,
+}
+
+ROLES = {"human": "user", "ai": "assistant", "AIMessageChunk": "assistant", "system": "system"}
+
+def chat_messages(system_prompt: str, messages: list) -> list:
+    # LangChain messages to the OpenAI style dicts llama_cpp takes, text parts only
+    result = [{"role": "system", "content": system_prompt}]
+    for message in messages:
+        content = message.content
+        if not isinstance(content, str):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        result.append({"role": ROLES.get(message.type, "user"), "content": content})
+    return result
+
+def save_state(state, path: str):
+    # Plain arrays in an .npz, never a pickle, since the file is read back on the next start
+    fields = {}
+    for name, value in vars(state).items():
+        if isinstance(value, bytes):
+            value = np.frombuffer(value, dtype=np.uint8)
+        fields[name] = np.asarray(value)
+
+    temporary = path + ".tmp"
+    with open(temporary, 'wb') as file:
+        np.savez(file, **fields)
+    os.replace(temporary, path)
+
+def load_state(path: str):
+    from llama_cpp import LlamaState
+
+    fields = {}
+    with np.load(path, allow_pickle=False) as data:
+        for name in data.files:
+            value = data[name]
+            if value.ndim == 0:
+                value = value.item()
+            elif value.dtype == np.uint8:
+                value = value.tobytes()
+            fields[name] = value
+    return LlamaState(**fields)
+
+class Stopped(Exception):
+    pass
+
+class LlamaServer:
+    # Runs llama_cpp.server as a child process: readiness probe, prompt warm-up, restart on crash
+    def __init__(self, model_path: str, host: str = "127.0.0.1", port: int = 8000, options: dict = None, system_prompt: str = "", log_path: str = "llama_server.log", restart: bool = True):
+        self.logger = logging.getLogger("LlamaServer")
+        self.model_path = model_path
+        self.host = host
+        self.port = port
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.system_prompt = system_prompt
+        self.log_path = log_path
+        self.restart = restart
+
+        self.process = None
+        self.running = False
+        self.ready = Event()
+        self.restarts = 0
+        self.thread = None
+
+    def command(self) -> list:
+        command = [
+            "python3", "-m", "llama_cpp.server",
+            "--model", self.model_path,
+            "--host", self.host,
+            "--port", str(self.port),
+            "--n_threads", str(self.options["n_threads"]),
+            "--n_batch", str(self.options["n_batch"]),
+            "--n_ctx", str(self.options["n_ctx"]),
+            "--use_mlock", str(self.options["use_mlock"]),
+            "--use_mmap", str(self.options["use_mmap"]),
+        ]
+
+        # The server keeps its prompt cache under .cache/llama_cache, so it survives a restart
+        if self.options["prompt_cache"]:
+            command += ["--cache", "True", "--cache_type", "disk"]
+        return command
+
+    def start(self):
+        self.running = True
+        self.thread = Thread(target=self.supervise, daemon=True)
+        self.thread.start()
+
+    def request(self, path: str, payload: dict = None, timeout: float = 2.0) -> dict:
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = Request(f"http://{self.host}:{self.port}{path}", data=data, headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+
+    def probe(self, timeout: float) -> bool:
+        deadline = perf_counter() + timeout
+        while self.running and perf_counter() < deadline:
+            if self.process.poll() is not None:
+                return False
+            try:
+                self.request("/v1/models")
+                return True
+            except Exception:
+                sleep(0.25)
+        return False
+
+    def warm_up(self):
+        # One token with the system prompt leaves it evaluated in the KV cache for the first real turn
+        start = perf_counter()
+        try:
+            self.request("/v1/chat/completions", {"messages": [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": "Hello"}], "max_tokens": 1}, timeout=120.0)
+            self.logger.info(f"Warm-up finished in {perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.logger.warning(f"Warm-up request failed: {e}")
+
+    def supervise(self, load_timeout: float = 300.0):
+        backoff = 1.0
+        while self.running:
+            self.process = Popen(self.command(), stdout=open(self.log_path, "a"), stderr=STDOUT, start_new_session=True)
+            self.logger.info(f"Started Llama server at {self.host} on port {self.port}, pid {self.process.pid}.\nRunning model {self.model_path}")
+
+            start = perf_counter()
+            if self.probe(load_timeout):
+                self.logger.info(f"Llama server ready in {perf_counter() - start:.2f}s")
+                self.warm_up()
+                self.ready.set()
+                backoff = 1.0
+
+            code = self.process.wait()
+            self.ready.clear()
+            if not self.running:
+                return
+
+            self.restarts += 1
+            if not self.restart:
+                self.logger.error(f"Llama server exited with code {code}")
+                return
+
+            self.logger.error(f"Llama server exited with code {code}, restarting in {backoff:.0f}s")
+            sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self.ready.wait(timeout)
+
+    def close(self, grace: float = 5.0):
+        self.running = False
+        if self.process is None or self.process.poll() is not None:
+            return
+
+        # Returns as soon as the server has exited, killing it only if it ignores the terminate
+        self.process.terminate()
+        try:
+            self.process.wait(grace)
+        except TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.logger.info("Llama server stopped")
+
+class LocalLlama:
+    # The GGUF model loaded in this process; tokens come straight from llama_cpp with no HTTP or LangChain in between
+    def __init__(self, model_path: str, options: dict = None, system_prompt: str = "", temperature: float = 0.7):
+        # Only the in-process backend needs the bindings loaded into this process
+        from llama_cpp import Llama
+
+        self.logger = logging.getLogger("LocalLlama")
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.lock = Lock()
+        self.ready = Event()
+        self.cancelled = None
+
+        start = perf_counter()
+        self.llama = Llama(
+            model_path=model_path,
+            n_threads=self.options["n_threads"],
+            n_batch=self.options["n_batch"],
+            n_ctx=self.options["n_ctx"],
+            use_mlock=self.options["use_mlock"],
+            use_mmap=self.options["use_mmap"],
+            verbose=False,
+        )
+        self.logger.info(f"Loaded {model_path} in {perf_counter() - start:.2f}s")
+
+        # generate() hands eval() the whole prompt at once; fed a batch at a time, a cancelled reply stops
+        # within one batch of prompt evaluation, or one token of sampling, instead of at the next token
+        self.evaluate = self.llama.eval
+        self.llama.eval = self.eval
+
+        self.state_path = self.options["kv_state_file"]
+        Thread(target=self.warm_up, daemon=True).start()
+
+    def tokenize(self, text: str) -> list:
+        return self.llama.tokenize(text.encode(), add_bos=False, special=True)
+
+    def warm_up(self):
+        # The Llama object keeps its KV cache between calls and reuses the longest matching prefix,
+        # so a saved state lets the next start skip evaluating the system prompt and recent history
+        with self.lock:
+            loaded = False
+            if self.state_path and os.path.exists(self.state_path):
+                try:
+                    self.llama.load_state(load_state(self.state_path))
+                    loaded = True
+                    self.logger.info(f"Restored KV state from {self.state_path}")
+                except Exception as e:
+                    self.logger.warning(f"Could not restore KV state: {e}")
+
+            if not loaded:
+                start = perf_counter()
+                self.llama.create_chat_completion(messages=[{"role": "system", "content": self.system_prompt}, {"role": "user", "content": "Hello"}], max_tokens=1)
+                self.logger.info(f"Warm-up finished in {perf_counter() - start:.2f}s")
+        self.ready.set()
+
+    def eval(self, tokens):
+        batch = self.options["n_batch"]
+        for i in range(0, len(tokens), batch):
+            if self.cancelled is not None and self.cancelled.is_set():
+                raise Stopped()
+            self.evaluate(tokens[i:i + batch])
+
+    def stream(self, messages: list, max_tokens: int = None, cancelled: Event = None):
+        with self.lock:
+            self.cancelled = cancelled
+            try:
+                for chunk in self.llama.create_chat_completion(messages=messages, stream=True, temperature=self.temperature, max_tokens=max_tokens):
+                    content = chunk["choices"][0]["delta"].get("content")
+                    if content:
+                        yield content
+            except Stopped:
+                self.logger.info("Generation stopped")
+            finally:
+                self.cancelled = None
+
+    def complete(self, messages: list, max_tokens: int = None) -> str:
+        return "".join(self.stream(messages, max_tokens))
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self.ready.wait(timeout)
+
+    def close(self):
+        if not self.state_path:
+            return
+
+        with self.lock:
+            try:
+                save_state(self.llama.save_state(), self.state_path)
+                self.logger.info(f"Saved KV state to {self.state_path}")
+            except Exception as e:
+                self.logger.warning(f"Could not save KV state: {e}")
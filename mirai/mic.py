@@ -1,15 +1,15 @@
 import logging
 import numpy as np
 import sounddevice as sd
-from librosa import resample
+from threading import Condition
+from .resample import StreamingResampler
 
 class Microphone:
-    def __init__(self, mic_name:str):
+    def __init__(self, mic_name:str, samplerate: int = 44100, target_sr: int = 16000, channels: int = 2, buffer_seconds: float = 10.0, native_rate: bool = False, block_duration: float = 0.05):
         self.logger = logging.getLogger("Microphone")
         self.device_idx = None
-        self.audio_buffer = None
         for i, device in enumerate(sd.query_devices()):
-        
+
             if device['max_input_channels'] > 0 and mic_name.lower() in device['name'].lower():
                 self.logger.debug(f"Found device {mic_name} at index {i}")
                 self.device_idx = i
@@ -18,16 +18,101 @@ class Microphone:
         if self.device_idx is None:
             raise RuntimeError(f"Could not find microphone with name: {mic_name}")
 
-    def record(self, duration=5, samplerate=44100, target_sr=16000, channels=2) -> np.ndarray:
-        if self.audio_buffer is None:
-            self.audio_buffer = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=channels, device=self.device_idx, dtype=np.float32)
-        
-        sd.wait()
+        self.target_sr = target_sr
+        self.channels = channels
+
+        # Fast mode opens the device at the target rate directly when the hardware allows it
+        if native_rate and self.supports_rate(target_sr):
+            samplerate = target_sr
+        self.samplerate = samplerate
+
+        if samplerate != target_sr:
+            self.resampler = StreamingResampler(samplerate, target_sr)
+            # Whole resampler periods per block keep the output size fixed
+            periods = max(1, round(block_duration * samplerate / self.resampler.down))
+            blocksize = periods * self.resampler.down
+        else:
+            self.resampler = None
+            blocksize = int(block_duration * samplerate)
+
+        # Ring buffer of mono samples at the target rate, filled by the stream callback
+        self.ring = np.zeros(int(buffer_seconds * target_sr), dtype=np.float32)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.condition = Condition()
+
+        # Frames dropped because the consumer fell a whole ring behind, and PortAudio overflow reports
+        self.overruns = 0
+        self.input_overflows = 0
+
+        self.stream = sd.InputStream(samplerate=samplerate, channels=channels, device=self.device_idx, dtype=np.float32, blocksize=blocksize, callback=self._callback)
+        self.stream.start()
+        self.logger.info(f"Capture stream started at {samplerate}Hz, delivering {target_sr}Hz")
+
+    def supports_rate(self, samplerate: int) -> bool:
+        try:
+            sd.check_input_settings(device=self.device_idx, samplerate=samplerate, channels=self.channels, dtype=np.float32)
+            return True
+        except Exception as e:
+            self.logger.debug(f"Device does not support {samplerate}Hz: {e}")
+            return False
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.input_overflows += 1
+
+        samples = indata[:, 0]
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+            frames = len(samples)
+
+        size = len(self.ring)
+        with self.condition:
+            start = self.write_pos % size
+            first = min(frames, size - start)
+            self.ring[start:start + first] = samples[:first]
+            self.ring[:frames - first] = samples[first:]
+            self.write_pos += frames
+
+            behind = self.write_pos - self.read_pos
+            if behind > size:
+                self.overruns += behind - size
+                self.read_pos = self.write_pos - size
+
+            self.condition.notify_all()
+
+    def available(self) -> int:
+        with self.condition:
+            return self.write_pos - self.read_pos
+
+    def read(self, frames: int, out: np.ndarray = None, timeout: float = None) -> np.ndarray:
+        # Pull exactly `frames` contiguous samples, returns None if they did not arrive within timeout
+        if frames > len(self.ring):
+            raise ValueError(f"Cannot read {frames} frames from a ring of {len(self.ring)}")
+
+        if out is None:
+            out = np.empty(frames, dtype=np.float32)
+
+        size = len(self.ring)
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.write_pos - self.read_pos >= frames, timeout):
+                return None
+
+            start = self.read_pos % size
+            first = min(frames, size - start)
+            out[:first] = self.ring[start:start + first]
+            out[first:frames] = self.ring[:frames - first]
+            self.read_pos += frames
+
+        return out[:frames]
 
-        new_audio_buffer = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=channels, device=self.device_idx, dtype=np.float32)
+    def record(self, duration=5, timeout: float = None) -> np.ndarray:
+        audio = self.read(int(duration * self.target_sr), timeout=timeout)
+        if audio is not None:
+            self.logger.debug(f"Recorded {duration} seconds")
 
-        self.logger.debug(f"Recorded {duration} seconds")
-        resampled = resample(self.audio_buffer[:,0].flatten(), orig_sr=samplerate, target_sr=target_sr)
+        return audio
 
-        self.audio_buffer = new_audio_buffer
-        return resampled
\ No newline at end of file
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
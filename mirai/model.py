@@ -1,67 +1,59 @@
+import httpx
 import logging
-from subprocess import Popen, STDOUT
-from time import time, sleep
-from threading import Thread
+import socket
+from time import time
+from threading import Event, Lock, Thread
 from queue import Queue
+from .segmenter import SentenceSegmenter
 from .tts import TTS
 
+from .context import ContextManager, TokenCounter
+from .history import ChatHistoryStore
+from .llama import LocalLlama, chat_messages
+from .router import CircuitBreaker, HedgedRouter
+
 from langchain_openai import ChatOpenAI
-from langchain_core.chat_history import (
-    BaseChatMessageHistory,
-    InMemoryChatMessageHistory,
-)
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.runnables import RunnableLambda
 from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
 
-store = {}
-def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-
-        try:
-            with open("chat_history.txt", "r") as f:
-                store[session_id].messages = eval(f.read())
-        except Exception as e:
-            print(f"ERROR: {e}")
-    
-    return store[session_id]
-
 class Model:
-    def __init__(self, model_path: str, voice_path: str, core, cheat_host: str, cheat_port: int, prompt: str, host: str = "127.0.0.1", port: int = 8000):
+    def __init__(self, llm, tts: TTS, core, cheat_host: str, cheat_port: int, prompt: str, host: str = "127.0.0.1", port: int = 8000, tracer=None, segmenter=None, history=None, session_id: str = "default", context_budget: int = 3072, cheat_context_budget: int = 6144, cheat_first_token_deadline: float = 4.0, cheat_probe_interval: float = 10.0, cheat_picture_deadline: float = 30.0):
         self.logger = logging.getLogger("Model")
-        
-        command = [
-            "python3", "-m", "llama_cpp.server",
-            "--model", model_path,
-            "--host", host,
-            "--port", str(port),
-            "--n_threads", "4",
-            "--n_ctx", "4096",
-        ]
-
-        # Open in the background
-        self.process = Popen(command, stdout=open("llama_server.log", "w"), stderr=STDOUT, start_new_session=True)
-        self.logger.info(f"Started Llama server at {host} on port {port}.\nRunning model {model_path}")
-
-        self.tts = TTS(voice_path)
+        self.tracer = tracer
+        self.system_prompt = prompt
+
+        # Started by the caller so the weights load alongside everything else: a LlamaServer, a LocalLlama,
+        # or None when an OpenAI compatible server is already listening on host:port
+        self.llm = llm
+        self.local = llm if isinstance(llm, LocalLlama) else None
+
+        self.tts = tts
+        self.segmenter = segmenter or SentenceSegmenter()
         self.running = True
         self.queue = Queue()
 
+        # The open reply stream is tracked so a barge-in can cut its connection from another thread
+        self.response = None
+        self.client = httpx.Client(timeout=httpx.Timeout(600.0, connect=5.0), event_hooks={"response": [self.track_response]})
         self.model = ChatOpenAI(
             model="qwen2.5",
             base_url=f"http://{host}:{port}/v1",
             api_key="not_needed",
-            temperature=0.7
+            temperature=0.7,
+            http_client=self.client
         )
 
+        # One keep-alive pool for the remote; retries are replaced by the circuit breaker and the local fallback
+        self.cheat_url = f"http://{cheat_host}:{cheat_port}/v1"
+        self.cheat_client = httpx.Client(timeout=httpx.Timeout(30.0, connect=2.0), limits=httpx.Limits(max_keepalive_connections=2, keepalive_expiry=120.0))
         self.cheat_model = ChatOpenAI(
             model="llama3.2-vision:11b",
-            base_url=f"http://{cheat_host}:{cheat_port}/v1",
+            base_url=self.cheat_url,
             api_key="not_needed",
             temperature=0.7,
-            timeout=10,
-            max_retries=3
+            http_client=self.cheat_client,
+            max_retries=0
         )
 
         self.prompt = ChatPromptTemplate.from_messages(
@@ -74,91 +66,233 @@ class Model:
             ]
         )
 
-        self.chain = self.prompt | self.model
-        self.cheat_chain = self.prompt | self.cheat_model
+        # History is trimmed to each model's token budget; rolled out turns are summarized between replies
+        counter = TokenCounter(tokenize=self.local.tokenize) if self.local is not None else TokenCounter(f"http://{host}:{port}")
+        self.context = ContextManager(counter, context_budget, prompt, summarizer=self.summarize)
+        self.cheat_context = ContextManager(TokenCounter(), cheat_context_budget, prompt, summarizer=self.summarize)
+
+        self.chain = RunnableLambda(self.context.fit) | self.prompt | self.model
+        self.cheat_chain = RunnableLambda(self.cheat_context.fit) | self.prompt | self.cheat_model
+
+        # Each exchange is appended to its session's JSONL file once it is known what was heard of the reply
+        self.history = history or ChatHistoryStore()
+        self.session_id = session_id
 
-        self.base_model = RunnableWithMessageHistory(self.chain, get_session_history)
-        self.cheat_model = RunnableWithMessageHistory(self.cheat_chain, get_session_history)
-        self.config = {"configurable": {"session_id": "abc1"}}
+        self.breaker = CircuitBreaker(self.probe_remote, probe_interval=cheat_probe_interval)
+        self.router = HedgedRouter(lambda messages: self.stream_chain(self.cheat_chain, messages), lambda messages: self.stream_reply(self.chain, messages), self.breaker, cheat_first_token_deadline, cheat_picture_deadline)
 
         self.cheat_mode = False
+        self.busy = False
+        self.completed = 0
+
+        # Set by a new press while a reply is streaming or playing
+        self.interrupted = Event()
+        self.interrupt_lock = Lock()
 
         self.submit_thread = Thread(target=Model.submit_listener, args=(self, core))
         self.submit_thread.start()
 
+    def set_cheat_mode(self, enabled: bool):
+        # The remote is only probed once cheat mode is wanted, never at startup
+        if enabled and not self.cheat_mode:
+            self.breaker.check()
+        self.cheat_mode = enabled
+
+    def summarize(self, request: list, max_tokens: int) -> str:
+        if self.local is not None:
+            return self.local.complete(chat_messages(request[0].content, request[1:]), max_tokens)
+        return self.model.bind(max_tokens=max_tokens).invoke(request).content
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self.llm is None or self.llm.wait_ready(timeout)
+
+    def probe_remote(self) -> bool:
+        try:
+            return self.cheat_client.get(f"{self.cheat_url}/models", timeout=2.0).status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def stream_chain(self, chain, messages: list):
+        stream = chain.stream(messages)
+        try:
+            for r in stream:
+                yield r.content
+        finally:
+            stream.close()
+
+    def stream_reply(self, chain, messages: list):
+        # Closing this generator drops the HTTP stream, which stops the server generating, or stops local sampling
+        if chain is self.cheat_chain:
+            yield from self.router.stream(messages)
+        elif self.local is not None:
+            # In-process path: the same context budget, without LangChain or HTTP per token
+            yield from self.local.stream(chat_messages(self.system_prompt, self.context.fit(messages)), cancelled=self.interrupted)
+        else:
+            yield from self.stream_chain(chain, messages)
+
+    def track_response(self, response: httpx.Response):
+        self.response = response
+        if self.busy and self.interrupted.is_set():
+            self.disconnect(response)
+
+    def disconnect(self, response: httpx.Response):
+        # Shutting the socket down wakes the blocked read at once, and llama_cpp.server stops generating
+        # when its next token cannot be sent; closing the generator is not possible while it is being read
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def interrupt(self):
+        # Barge-in: stop generating and cut off speech; only what was already heard is kept.
+        # LocalLlama watches the interrupted event itself, the HTTP stream is cut here
+        with self.interrupt_lock:
+            if not self.busy or self.interrupted.is_set():
+                return
+            self.interrupted.set()
+            self.tts.cancel()
+            if self.response is not None:
+                self.disconnect(self.response)
+        self.logger.info("Reply interrupted")
+
+    def speak(self, text: str, turn, first: bool = False) -> bool:
+        with self.interrupt_lock:
+            if self.interrupted.is_set():
+                return False
+            if first:
+                self.trace(turn, "first_sentence")
+            self.tts.say(text, turn)
+            return True
+
+    def trace(self, turn, event: str, **attributes):
+        if self.tracer is not None:
+            self.tracer.emit(turn, event, **attributes)
+
     def submit_listener(self, core):
-        sleep(3)
-        while self.running:
-            if self.queue.qsize() == 0:
-                sleep(1)
-                continue
+        while self.running and not self.wait_ready(1.0):
+            pass
 
-            user_input, picture_taken, picture = self.queue.get()
+        while self.running:
+            # Blocks until a transcript arrives; close() wakes it with None
+            item = self.queue.get()
+            if item is None:
+                break
 
-            buffer = ""
+            user_input, picture_taken, picture, turn = item
+            with self.interrupt_lock:
+                self.busy = True
+                self.interrupted.clear()
+                self.response = None
+            self.segmenter.reset()
+            self.tts.take_spoken()
 
             start = time()
 
-            if self.cheat_mode:
-                selected_model = self.cheat_model
-            else:
-                selected_model = self.base_model
+            history = self.history.get(self.session_id)
+            chain = self.cheat_chain if self.cheat_mode else self.chain
+            remember = True
+            failed = False
+            reply = ""
+            stream = None
+            # Each trace event is a queue put and a trace file line, so they go out once per turn
+            first_token = True
+            first_sentence = True
 
             try:
+                data = None
+                if picture_taken and picture is not None:
+                    # The camera service captures and encodes while the transcript was being submitted
+                    try:
+                        mime_type, data = picture.result(timeout=15)
+                    except Exception as e:
+                        self.logger.error(f"Camera failed: {e}")
+                        self.tts.say("Could not capture frame!")
+
                 if picture_taken:
-                    if self.cheat_mode:
+                    if self.cheat_mode and data is not None:
                         # Add picture image processed first
                         message = HumanMessage(content=[
                             {"type": "text", "text": f"Describe the image shown and use it to complete any questions asked. Ignore any request to take a picture, this is an artifact of the user's input. {user_input}"},
-                            {"type": "image_url", "image_url": f"data:image/png;base64,{picture}"}
+                            {"type": "image_url", "image_url": f"data:{mime_type};base64,{data}"}
                         ])
                         # We cannot save this history; It destroys everything
-                        selected_model = self.cheat_chain
+                        remember = False
                     else:
-                        self.tts.say("Cheat mode deactivated, cannot use picture data.")
+                        if not self.cheat_mode:
+                            self.tts.say("Cheat mode deactivated, cannot use picture data.")
                         message = HumanMessage(content=user_input)
                 else:
                     message = HumanMessage(content=user_input)
 
                 print("Response: ")
-                for r in selected_model.stream(
-                    [message],
-                    config=self.config,
-                ):
-                    buffer += r.content
-                    core.response_buffer += r.content
-
-                    for i in range(len(buffer)):
-                        if buffer[i] in ['.', '?', '!']:
-                            print(buffer[0:i+1])
-                            self.tts.say(buffer[0:i+1])
-                            buffer = buffer[i + 1:]
-                            break
+                self.trace(turn, "llm_submit", cheat_mode=self.cheat_mode)
+                stream = self.stream_reply(chain, history.messages + [message] if remember else [message])
+                for content in stream:
+                    if self.interrupted.is_set():
+                        break
+                    if first_token and len(content) > 0:
+                        self.trace(turn, "llm_first_token")
+                        first_token = False
+                    core.response_buffer += content
+                    reply += content
+
+                    # Only the new text is scanned; the first clause may go out before its full stop
+                    for sentence in self.segmenter.feed(content):
+                        print(sentence)
+                        if self.speak(sentence, turn, first_sentence):
+                            first_sentence = False
             except Exception as e:
-                print(f"ERROR: {e}")
+                # A barge-in cuts the stream's connection, which ends it with an error that is not a failure
+                if not self.interrupted.is_set():
+                    print(f"ERROR: {e}")
+                    failed = True
 
-                if self.cheat_mode:
-                    self.cheat_mode = False
+                    if self.cheat_mode:
+                        self.cheat_mode = False
 
+            if stream is not None:
+                stream.close()
 
             end = time()
 
             print(f"AI Response {end - start}s")
-            if(len(buffer) > 1):
-                self.tts.say(buffer)
+            remainder = self.segmenter.flush()
+            if remainder is not None:
+                self.speak(remainder, turn, first_sentence)
+
+            # Speech plays behind the LLM stream; the turn ends once it has all been heard or is cut off
+            self.tts.wait_drained()
+
+            if self.interrupted.is_set():
+                reply = " ".join(self.tts.take_spoken())
+                self.trace(turn, "barge_in", spoken_chars=len(reply))
+
+            if remember and not failed:
+                history.add_messages([message, AIMessage(content=reply)] if reply else [message])
+            elif not remember:
+                history.add_message(AIMessageChunk(content=reply))
+
+            self.trace(turn, "turn_complete")
+            self.completed += 1
+            self.busy = False
 
-            with open("chat_history.txt", 'w') as f:
-                if picture_taken and selected_model == self.cheat_chain:
-                    get_session_history(self.config["configurable"]["session_id"]).messages.append(AIMessageChunk(content=core.response_buffer))
-                print(get_session_history(self.config["configurable"]["session_id"]).messages, file=f)
+            if self.queue.empty():
+                self.context.summarize()
+                self.cheat_context.summarize()
 
 
     def close(self):
         self.running = False
-        self.process.terminate()
-        sleep(3)
+        self.tts.cancel()
+        self.queue.put(None)
+        self.submit_thread.join(timeout=5.0)
+        self.tts.close()
+        self.breaker.close()
+        self.cheat_client.close()
+        self.client.close()
 
-        if self.process.poll() is None:
-            self.process.kill()
-        
-        self.logger.info("Llama server killed")
+        if self.llm is not None:
+            self.llm.close()
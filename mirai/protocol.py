@@ -0,0 +1,70 @@
+import json
+import socket
+import struct
+import numpy as np
+from threading import Lock
+
+# Every frame is a kind byte and a big-endian payload length. JSON frames carry control messages,
+# audio frames 16-bit mono PCM: 16kHz from the client, the voice's sample rate from the server
+HEADER = struct.Struct(">cI")
+JSON = b"J"
+AUDIO = b"A"
+
+# The length comes from the peer, so it is checked before anything is allocated; 8 MB is over three minutes of 22kHz PCM
+MAX_PAYLOAD = 8 * 1024 * 1024
+
+class Connection:
+    def __init__(self, sock: socket.socket, max_payload: int = MAX_PAYLOAD):
+        self.sock = sock
+        self.max_payload = max_payload
+        self.send_lock = Lock()
+
+    def send(self, kind: bytes, payload: bytes):
+        # Reply text and PCM are sent from different threads, so whole frames go out under one lock
+        with self.send_lock:
+            self.sock.sendall(HEADER.pack(kind, len(payload)))
+            self.sock.sendall(payload)
+
+    def send_json(self, message: dict):
+        self.send(JSON, json.dumps(message).encode())
+
+    def send_audio(self, audio: np.ndarray):
+        if audio.dtype != np.int16:
+            audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        self.send(AUDIO, audio.tobytes())
+
+    def receive_exact(self, size: int) -> bytes:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if count == 0:
+                return None
+            received += count
+        return bytes(buffer)
+
+    def receive(self) -> tuple:
+        # (JSON, dict) or (AUDIO, int16 array), or (None, None) once the peer has gone
+        header = self.receive_exact(HEADER.size)
+        if header is None:
+            return None, None
+        kind, length = HEADER.unpack(header)
+        if length > self.max_payload:
+            raise ValueError(f"Frame of {length} bytes is over the {self.max_payload} byte limit")
+        payload = self.receive_exact(length) if length else b""
+        if payload is None:
+            return None, None
+
+        if kind == JSON:
+            return kind, json.loads(payload)
+        if kind == AUDIO:
+            return kind, np.frombuffer(payload, dtype=np.int16)
+        raise ValueError(f"Unknown frame kind {kind!r}")
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
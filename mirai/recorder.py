@@ -0,0 +1,181 @@
+import logging
+import os
+import struct
+import numpy as np
+from datetime import datetime
+from queue import Queue, Empty
+from threading import Thread
+from time import perf_counter
+from soundfile import SoundFile
+
+FORMATS = {"flac": ".flac", "wav": ".wav", "raw": ".pcm"}
+
+def open_recording(path: str, samplerate: int = 16000) -> SoundFile:
+    # Raw captures have no header, so their layout is the one the recorder writes
+    if path.endswith(FORMATS["raw"]):
+        return SoundFile(path, samplerate=samplerate, channels=1, subtype='PCM_16', format='RAW')
+    return SoundFile(path)
+
+class FlacWriter:
+    # Smallest files, but encoding costs CPU on every chunk
+    def __init__(self, path: str, samplerate: int):
+        self.path = path
+        self.file = SoundFile(path, mode='w', samplerate=samplerate, channels=1, format='FLAC')
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def write(self, audio: np.ndarray):
+        self.file.write(audio)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class PCMWriter:
+    # 16-bit samples straight to disk with no encoding; a WAV header is patched in on every flush
+    def __init__(self, path: str, samplerate: int, header: bool = True, preallocate: int = 0):
+        self.file = open(path, 'wb')
+        self.samplerate = samplerate
+        self.header = header
+        self.data_bytes = 0
+        self.samples = np.empty(0, dtype=np.int16)
+
+        if preallocate and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self.file.fileno(), 0, preallocate)
+            except OSError:
+                pass
+
+        if header:
+            self.file.write(self.wav_header())
+
+    def wav_header(self) -> bytes:
+        return b"RIFF" + struct.pack("<I", 36 + self.data_bytes) + b"WAVEfmt " + struct.pack("<IHHIIHH", 16, 1, 1, self.samplerate, self.samplerate * 2, 2, 16) + b"data" + struct.pack("<I", self.data_bytes)
+
+    @property
+    def size(self) -> int:
+        return (44 if self.header else 0) + self.data_bytes
+
+    def write(self, audio: np.ndarray):
+        if len(self.samples) < len(audio):
+            self.samples = np.empty(len(audio), dtype=np.int16)
+        samples = self.samples[:len(audio)]
+        np.multiply(np.clip(audio, -1.0, 1.0), 32767, out=samples, casting='unsafe')
+        self.file.write(samples.tobytes())
+        self.data_bytes += samples.nbytes
+
+    def flush(self):
+        # Keeps the file playable up to here if the process dies
+        if self.header:
+            self.file.seek(0)
+            self.file.write(self.wav_header())
+            self.file.seek(self.size)
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.truncate(self.size)
+        self.file.close()
+
+class Recorder:
+    # Capture hands chunks to a bounded pool of slots; a writer thread encodes and flushes them,
+    # so a slow SD card costs recorded chunks, never capture timing
+    def __init__(self, directory: str = "./out/recordings", format: str = "flac", samplerate: int = 16000, chunk_frames: int = 1600, buffer_seconds: float = 30.0, flush_interval: float = 5.0, rotate_seconds: float = None, rotate_bytes: int = None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown recording format {format}, expected one of {', '.join(FORMATS)}")
+
+        self.logger = logging.getLogger("Recorder")
+        self.directory = directory
+        self.format = format
+        self.samplerate = samplerate
+        self.flush_interval = flush_interval
+        self.rotate_frames = int(rotate_seconds * samplerate) if rotate_seconds else None
+        self.rotate_bytes = rotate_bytes
+
+        # Preallocated once; the capture side only copies into a free slot
+        slots = max(2, int(buffer_seconds * samplerate / chunk_frames))
+        self.slots = np.empty((slots, chunk_frames), dtype=np.float32)
+        self.free = Queue()
+        self.filled = Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+        self.dropped = 0
+        self.files = 0
+        self.writer = None
+        self.file_frames = 0
+        self.session = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        os.makedirs(directory, exist_ok=True)
+        self.thread = Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def write(self, audio: np.ndarray):
+        try:
+            slot = self.free.get_nowait()
+        except Empty:
+            self.dropped += 1
+            return
+
+        frames = min(len(audio), self.slots.shape[1])
+        self.slots[slot, :frames] = audio[:frames]
+        self.filled.put((slot, frames))
+
+    def open(self):
+        self.files += 1
+        name = f"recording_{self.session}" if self.files == 1 else f"recording_{self.session}_{self.files:03d}"
+        path = os.path.join(self.directory, name + FORMATS[self.format])
+
+        if self.format == "flac":
+            self.writer = FlacWriter(path, self.samplerate)
+        else:
+            # Reserving a whole rotation keeps the file contiguous on the card instead of growing it chunk by chunk
+            self.writer = PCMWriter(path, self.samplerate, header=self.format == "wav", preallocate=self.rotate_bytes or 2 * (self.rotate_frames or 0))
+        self.file_frames = 0
+        self.logger.info(f"Recording to {path}")
+
+    def rotate_due(self) -> bool:
+        if self.rotate_frames is not None and self.file_frames >= self.rotate_frames:
+            return True
+        return self.rotate_bytes is not None and self.writer.size >= self.rotate_bytes
+
+    def write_loop(self):
+        self.open()
+        last_flush = perf_counter()
+
+        while True:
+            try:
+                item = self.filled.get(timeout=self.flush_interval)
+            except Empty:
+                item = ()
+
+            if item is None:
+                break
+
+            if item:
+                slot, frames = item
+                self.writer.write(self.slots[slot, :frames])
+                self.free.put(slot)
+                self.file_frames += frames
+
+                if self.rotate_due():
+                    self.writer.close()
+                    self.open()
+                    last_flush = perf_counter()
+
+            if perf_counter() - last_flush >= self.flush_interval:
+                self.writer.flush()
+                last_flush = perf_counter()
+
+        self.writer.close()
+
+    def close(self):
+        # Everything already handed over is written before the file is closed
+        self.filled.put(None)
+        self.thread.join()
+        if self.dropped:
+            self.logger.warning(f"Recording dropped {self.dropped} chunks")
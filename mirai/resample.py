@@ -0,0 +1,82 @@
+import numpy as np
+from math import gcd
+
+class StreamingResampler:
+    def __init__(self, orig_sr: int, target_sr: int, taps_per_phase: int = 32, rolloff: float = 0.9, beta: float = 8.0):
+        divisor = gcd(orig_sr, target_sr)
+        self.up = target_sr // divisor
+        self.down = orig_sr // divisor
+        self.taps = taps_per_phase
+
+        # Windowed-sinc prototype at the upsampled rate, cut off below the lower Nyquist
+        length = self.taps * self.up
+        cutoff = rolloff * 0.5 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+        prototype *= self.up / prototype.sum()
+
+        # bank[p, k] multiplies the input k samples before the output position for phase p
+        self.bank = prototype.reshape(self.taps, self.up).T.astype(np.float32)
+
+        self.next_out = 0
+        self.in_start = 0
+        self.work = np.zeros(self.taps - 1, dtype=np.float32)
+        self.gather = np.empty((0, self.taps), dtype=np.float32)
+        self.out = np.empty(0, dtype=np.float32)
+        self.plans = {}
+
+    def _plan(self, frames: int):
+        key = (self.next_out, self.in_start, frames)
+        plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+
+        # Every output whose newest input sample lands in this chunk
+        last = ((self.in_start + frames) * self.up - 1) // self.down
+        outputs = np.arange(self.next_out, last + 1)
+        centre = (outputs * self.down) // self.up - self.in_start + self.taps - 1
+        indices = centre[:, None] - np.arange(self.taps)[None, :]
+        coefficients = self.bank[(outputs * self.down) % self.up]
+
+        # Chunk sizes are fixed in steady state, so this rarely holds more than a couple of entries
+        if len(self.plans) > 8:
+            self.plans.clear()
+        plan = (indices, coefficients, last + 1)
+        self.plans[key] = plan
+        return plan
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        # Returns a view into an internal buffer that is only valid until the next call
+        frames = len(chunk)
+        history = self.taps - 1
+        if len(self.work) < history + frames:
+            work = np.zeros(history + frames, dtype=np.float32)
+            work[:history] = self.work[:history]
+            self.work = work
+
+        self.work[history:history + frames] = chunk
+        indices, coefficients, next_out = self._plan(frames)
+        count = len(indices)
+
+        if len(self.out) < count:
+            self.out = np.empty(count, dtype=np.float32)
+            self.gather = np.empty((count, self.taps), dtype=np.float32)
+
+        gather = self.gather[:count]
+        np.take(self.work, indices, out=gather)
+        np.einsum('nk,nk->n', gather, coefficients, out=self.out[:count])
+
+        self.work[:history] = self.work[frames:frames + history]
+
+        # Fold the counters back every full period so they never grow
+        periods = next_out // self.up
+        self.next_out = next_out - periods * self.up
+        self.in_start += frames - periods * self.down
+
+        return self.out[:count]
+
+    def reset(self):
+        self.next_out = 0
+        self.in_start = 0
+        self.work[:] = 0
+        self.plans.clear()
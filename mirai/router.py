@@ -0,0 +1,154 @@
+import logging
+from queue import Queue, Empty
+from threading import Event, Lock, Thread
+from langchain_core.messages import HumanMessage
+
+DONE = object()
+
+# Spoken instead of a local answer when the turn carries a picture the local model cannot see
+PICTURE_FALLBACK = "Cheat mode is unavailable, cannot use picture data."
+
+def has_picture(messages: list) -> bool:
+    return any(not isinstance(message.content, str) and any(isinstance(part, dict) and part.get("type") == "image_url" for part in message.content) for message in messages)
+
+def text_only(messages: list) -> list:
+    # The local model cannot see pictures, so a fallback gets the text of each message
+    result = []
+    for message in messages:
+        if isinstance(message.content, str):
+            result.append(message)
+        else:
+            text = " ".join(part.get("text", "") for part in message.content if isinstance(part, dict))
+            result.append(HumanMessage(content=text) if message.type == "human" else message.__class__(content=text))
+    return result
+
+class CircuitBreaker:
+    # Opens after consecutive failures and closes again once the health probe succeeds
+    def __init__(self, probe, failure_threshold: int = 1, probe_interval: float = 10.0):
+        self.logger = logging.getLogger("CircuitBreaker")
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+
+        self.failures = 0
+        self.open = False
+        self.lock = Lock()
+        self.closed = Event()
+        self.closed.set()
+        self.stopped = Event()
+
+    def allow(self) -> bool:
+        return not self.open
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self, reason: str):
+        with self.lock:
+            self.failures += 1
+            if self.open or self.failures < self.failure_threshold:
+                return
+            self.open = True
+            self.closed.clear()
+
+        self.logger.warning(f"Remote marked down: {reason}")
+        Thread(target=self.probe_loop, daemon=True).start()
+
+    def probe_loop(self):
+        while not self.stopped.wait(self.probe_interval):
+            if self.probe():
+                with self.lock:
+                    self.open = False
+                    self.failures = 0
+                    self.closed.set()
+                self.logger.info("Remote recovered")
+                return
+
+    def check(self):
+        # Probes once in the background so a dead remote is known before the first request
+        def worker():
+            if not self.probe():
+                self.failure("health probe failed")
+
+        Thread(target=worker, daemon=True).start()
+
+    def close(self):
+        self.stopped.set()
+
+class HedgedRouter:
+    # Sends to the remote while it is healthy, answering locally if it has no first token within the deadline
+    def __init__(self, remote, local, breaker: CircuitBreaker, first_token_deadline: float = 4.0, picture_deadline: float = 30.0):
+        self.logger = logging.getLogger("HedgedRouter")
+        self.remote = remote
+        self.local = local
+        self.breaker = breaker
+        self.first_token_deadline = first_token_deadline
+        # A vision model takes longer to read an image, and a picture turn has no local answer to hedge with
+        self.picture_deadline = picture_deadline
+        self.fallbacks = 0
+
+    def pump(self, messages: list, tokens: Queue, cancelled: Event):
+        stream = None
+        try:
+            stream = self.remote(messages)
+            for content in stream:
+                if cancelled.is_set():
+                    break
+                if content:
+                    tokens.put(content)
+            tokens.put(DONE)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def fallback(self, messages: list, reason: str):
+        self.fallbacks += 1
+        # The image instruction without its image would have the local model describe a picture it never saw
+        if has_picture(messages):
+            self.logger.warning(f"Cannot answer a picture turn locally: {reason}")
+            yield PICTURE_FALLBACK
+            return
+
+        self.logger.warning(f"Answering locally: {reason}")
+        yield from self.local(text_only(messages))
+
+    def stream(self, messages: list):
+        if not self.breaker.allow():
+            yield from self.fallback(messages, "remote is down")
+            return
+
+        picture = has_picture(messages)
+        deadline = self.picture_deadline if picture else self.first_token_deadline
+        tokens = Queue()
+        cancelled = Event()
+        Thread(target=self.pump, args=(messages, tokens, cancelled), daemon=True).start()
+
+        try:
+            timed_out = False
+            try:
+                item = tokens.get(timeout=deadline)
+            except Empty:
+                item = TimeoutError(f"no first token within {deadline:.1f}s")
+                timed_out = True
+
+            if isinstance(item, Exception):
+                cancelled.set()
+                # A slow answer about a picture says nothing about the remote being down
+                if not (picture and timed_out):
+                    self.breaker.failure(str(item))
+                yield from self.fallback(messages, str(item))
+                return
+
+            self.breaker.success()
+            while item is not DONE:
+                if isinstance(item, Exception):
+                    self.breaker.failure(str(item))
+                    raise item
+                yield item
+                item = tokens.get()
+        finally:
+            # Also reached when the caller closes the stream on barge-in
+            cancelled.set()
@@ -0,0 +1,103 @@
+import logging
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import perf_counter
+
+class FairScheduler:
+    # Shares a pool of resources (Whisper workers, voices, LLM slots) between sessions. Each session's jobs run
+    # in order and one at a time, and sessions with work waiting take turns, so a long reply cannot starve the rest
+    def __init__(self, name: str, resources: list):
+        self.logger = logging.getLogger(f"FairScheduler.{name}")
+        self.name = name
+        self.queues = {}
+        self.waiting = deque()
+        self.running = set()
+        self.condition = Condition()
+        self.stopped = False
+
+        self.completed = 0
+        self.queue_seconds = 0.0
+        self.busy_seconds = 0.0
+
+        self.threads = [Thread(target=self.worker, args=(resource,), daemon=True, name=f"{name}-{i}") for i, resource in enumerate(resources)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, session: str, job) -> Future:
+        # job(resource) runs on whichever resource is free; the Future gets its result
+        future = Future()
+        with self.condition:
+            self.queues.setdefault(session, deque()).append((job, future, perf_counter()))
+            if session not in self.running and session not in self.waiting:
+                self.waiting.append(session)
+                self.condition.notify()
+        return future
+
+    def cancel(self, session: str):
+        with self.condition:
+            queue = self.queues.pop(session, deque())
+            if session in self.waiting:
+                self.waiting.remove(session)
+        for _, future, _ in queue:
+            future.cancel()
+
+    def next_job(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.waiting or self.stopped)
+            if self.stopped:
+                return None
+
+            session = self.waiting.popleft()
+            job, future, queued = self.queues[session].popleft()
+            if not self.queues[session]:
+                del self.queues[session]
+            self.running.add(session)
+            return session, job, future, queued
+
+    def worker(self, resource):
+        while True:
+            item = self.next_job()
+            if item is None:
+                return
+
+            session, job, future, queued = item
+            start = perf_counter()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(job(resource))
+                except Exception as e:
+                    future.set_exception(e)
+
+            with self.condition:
+                self.running.discard(session)
+                # Back of the line, behind every session that waited while this one ran
+                if session in self.queues:
+                    self.waiting.append(session)
+                    self.condition.notify()
+                self.completed += 1
+                self.queue_seconds += start - queued
+                self.busy_seconds += perf_counter() - start
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "completed": self.completed,
+                "queued": sum(len(queue) for queue in self.queues.values()),
+                "mean_queue_seconds": self.queue_seconds / self.completed if self.completed else 0.0,
+                "busy_seconds": self.busy_seconds,
+            }
+
+    def close(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+            queues = list(self.queues.values())
+            self.queues = {}
+            self.waiting.clear()
+
+        for queue in queues:
+            for _, future, _ in queue:
+                future.cancel()
+        for thread in self.threads:
+            thread.join()
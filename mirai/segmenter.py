@@ -0,0 +1,112 @@
+import re
+
+TERMINATORS = ".?!"
+CLOSERS = "\"')]”’"
+CLAUSES = ",;:"
+
+# Only words that are never ordinary English, so "The answer is no." still ends a sentence
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "approx",
+    "inc", "ltd", "dept", "jan", "feb", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec", "mon", "tue", "thu", "fri",
+}
+
+# Abbreviations only when a number follows: "No. 5", "Fig. 3"
+NUMBERED = {"no", "fig"}
+
+# "e.g", "U.S", "a.m": single letters joined by full stops
+INITIALISM = re.compile(r"(?:[a-z]\.)+[a-z]")
+
+class SentenceSegmenter:
+    # Splits a streamed reply into speakable segments, scanning each character once
+    def __init__(self, first_clause_words: int = 10, min_clause_words: int = 4, abbreviations: set = ABBREVIATIONS):
+        self.first_clause_words = first_clause_words
+        self.min_clause_words = min_clause_words
+        self.abbreviations = abbreviations
+        self.reset()
+
+    def reset(self):
+        self.buffer = ""
+        self.position = 0
+        self.words = 0
+        self.in_word = False
+        self.emitted = 0
+
+    def word_before(self, i: int) -> str:
+        start = i
+        while start > 0 and not self.buffer[start - 1].isspace():
+            start -= 1
+        return self.buffer[start:i].strip("\"'([“‘").lower()
+
+    def protected(self, word: str, following: str) -> bool:
+        # A full stop that ends a known abbreviation, a dotted initialism or a list number is not a sentence boundary.
+        # Decimals never get here, a boundary needs whitespace after the full stop
+        if word in self.abbreviations or INITIALISM.fullmatch(word):
+            return True
+        if word in NUMBERED:
+            return following.isdigit()
+        return word.isdigit() and self.words == 1
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        segments = []
+        early = self.emitted == 0 and self.first_clause_words > 0
+
+        i = self.position
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            end = None
+
+            if char in TERMINATORS:
+                j = i + 1
+                while j < len(self.buffer) and (self.buffer[j] in TERMINATORS or self.buffer[j] in CLOSERS):
+                    j += 1
+                # Undecided until the next character arrives, "3." could still become "3.5"
+                if j == len(self.buffer):
+                    break
+                if self.buffer[j].isspace():
+                    word = self.word_before(i)
+                    # "No. 5" is only told apart from "no." once the character after the space arrives
+                    if word in NUMBERED and j + 1 == len(self.buffer):
+                        break
+                    if not self.protected(word, self.buffer[j + 1:j + 2]):
+                        end = j
+            elif char == "\n" and self.words > 0:
+                end = i
+            elif early and char in CLAUSES and self.words >= self.min_clause_words:
+                if i + 1 == len(self.buffer):
+                    break
+                if self.buffer[i + 1].isspace():
+                    end = i + 1
+            elif early and char.isspace() and self.in_word and self.words >= self.first_clause_words:
+                end = i
+
+            if end is not None:
+                segment = self.buffer[:end].strip()
+                self.buffer = self.buffer[end:]
+                self.words = 0
+                self.in_word = False
+                i = 0
+                if segment:
+                    segments.append(segment)
+                    self.emitted += 1
+                    early = False
+                continue
+
+            if char.isspace():
+                self.in_word = False
+            elif not self.in_word:
+                self.words += 1
+                self.in_word = True
+            i += 1
+
+        self.position = i
+        return segments
+
+    def flush(self) -> str:
+        # Whatever is left once the stream ends, if it has anything worth speaking
+        remainder = self.buffer.strip()
+        self.reset()
+        if any(char.isalnum() for char in remainder):
+            return remainder
+        return None
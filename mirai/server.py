@@ -0,0 +1,349 @@
+import json
+import logging
+import os
+import socketserver
+import uuid
+import numpy as np
+from argparse import ArgumentParser
+from itertools import count
+from threading import Event, Lock, Thread
+from time import perf_counter
+from langchain_core.messages import AIMessage, HumanMessage
+from .audiobus import AudioBus
+from .context import ContextManager, TokenCounter
+from .llama import LlamaServer
+from .protocol import AUDIO, Connection
+from .scheduler import FairScheduler
+from .segmenter import SentenceSegmenter
+from .startup import Startup
+from .stt import load_profile
+from .supervisor import STTSupervisor
+from .trace import MetricsServer, Tracer
+from .tts_cache import PCMCache
+
+class Session:
+    # One connected client: its own history, context window and sentence segmenter
+    def __init__(self, session_id: str, connection: Connection, history, context: ContextManager, segmenter: SentenceSegmenter):
+        self.id = session_id
+        self.connection = connection
+        self.history = history
+        self.context = context
+        self.segmenter = segmenter
+
+class SessionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.app.handle_connection(self.request)
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class SessionServer:
+    # Headless MirAI for network clients: every connection is a session, all of them share the Whisper workers,
+    # Piper voices and LLM slots through one fair scheduler per stage
+    def __init__(self, voice_path: str, llm_path: str = None, config_path: str = 'config.json'):
+        self.logger = logging.getLogger("SessionServer")
+
+        data = {}
+        try:
+            with open(config_path, 'r') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            self.logger.error(f"Failed to load JSON File: {e}")
+        self.config = data
+
+        self.base_host = data.get("base_host", "127.0.0.1")
+        self.base_port = data.get("base_port", 8000)
+        self.prompt = data.get("prompt", "You are a useful AI assistant. Please help the user.")
+        self.voice_path = voice_path
+
+        self.tracer = Tracer(data.get("trace_file", "trace.jsonl"))
+        self.tracer.start()
+        self.metrics = None
+        if data.get("metrics_port") is not None:
+            self.metrics = MetricsServer(self.tracer, port=data["metrics_port"])
+        self.startup = Startup(self.tracer)
+        self.turns = count(1)
+
+        # Whole utterances are written to the bus under a lock, so each one is a contiguous span for Whisper
+        self.audio_bus = AudioBus(data.get("server_audio_seconds", 300.0))
+        self.bus_lock = Lock()
+
+        profile = load_profile(data.get("stt_profile", "balanced"), data.get("stt_profiles"))
+        self.supervisors = [STTSupervisor(self.audio_bus, profile, self.tracer, deadline_factor=data.get("stt_deadline_factor", 2.0), deadline_min=data.get("stt_deadline_min", 5.0)) for _ in range(data.get("server_stt_workers", 1))]
+
+        self.history = None
+        self.counter = None
+        self.model = None
+        self.voices = []
+        self.llm = None
+        self.stt = None
+        self.tts = None
+        self.chat = None
+        self.sessions = set()
+        self.sessions_lock = Lock()
+        self.servers = []
+        self.stopped = Event()
+
+        # llama_cpp.server answers one request at a time, so more slots than that would only queue inside it
+        self.llm_slots = data.get("server_llm_slots", 1)
+        if llm_path is not None and self.llm_slots > 1:
+            self.logger.warning(f"server_llm_slots is {self.llm_slots}, but the llama_cpp.server started here decodes one request at a time; using 1")
+            self.llm_slots = 1
+
+        # Worker processes fork before any loading thread exists, as in MirAI
+        for supervisor in self.supervisors:
+            supervisor.start()
+        if llm_path is not None:
+            self.llm = LlamaServer(llm_path, self.base_host, self.base_port, data.get("llm_options"), self.prompt)
+            self.llm.start()
+
+        self.startup.add("whisper", self.load_whisper)
+        self.startup.add("llm", self.load_llm)
+        self.startup.add("voice", self.load_voice)
+        self.startup.add("model", self.load_model)
+
+    def load_whisper(self):
+        for supervisor in self.supervisors:
+            if not supervisor.active.ready.wait(supervisor.load_timeout):
+                raise RuntimeError(f"Whisper did not load within {supervisor.load_timeout:.0f}s")
+        self.stt = FairScheduler("stt", self.supervisors)
+
+    def load_llm(self):
+        if self.llm is not None and not self.llm.wait_ready(300.0):
+            raise RuntimeError("LLM did not become ready within 300s")
+
+    def load_voice(self):
+        from .tts import TTS
+
+        # One Piper voice per synthesis worker, all reading and filling the same PCM cache
+        cache = PCMCache(self.config.get("tts_cache_dir", "tts_cache"), int(self.config.get("tts_cache_mb", 32) * 1024 * 1024))
+        self.voices = [TTS(self.voice_path, tracer=self.tracer, cache=cache, playback=False) for _ in range(self.config.get("server_tts_workers", 1))]
+        self.tts = FairScheduler("tts", self.voices)
+
+    def load_model(self):
+        # The OpenAI client is the slow import, so it loads alongside Whisper and Piper
+        from langchain_openai import ChatOpenAI
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from .history import ChatHistoryStore
+
+        self.history = ChatHistoryStore(self.config.get("history_dir", "history"), self.config.get("history_max_messages", 200))
+        self.counter = TokenCounter(f"http://{self.base_host}:{self.base_port}")
+
+        self.model = ChatOpenAI(model="qwen2.5", base_url=f"http://{self.base_host}:{self.base_port}/v1", api_key="not_needed", temperature=0.7, max_retries=0)
+        prompt = ChatPromptTemplate.from_messages([("system", self.prompt), MessagesPlaceholder(variable_name="messages")])
+
+        # One slot per request the LLM server can decode at once
+        chain = prompt | self.model
+        self.chat = FairScheduler("llm", [chain] * self.llm_slots)
+
+    def summarize(self, request: list, max_tokens: int) -> str:
+        return self.model.bind(max_tokens=max_tokens).invoke(request).content
+
+    def open_session(self, session_id: str, connection: Connection) -> Session:
+        with self.sessions_lock:
+            if session_id in self.sessions:
+                raise ValueError(f"Session {session_id} is already connected")
+            self.sessions.add(session_id)
+
+        context = ContextManager(self.counter, self.config.get("context_budget", 3072), self.prompt, summarizer=self.summarize)
+        segmenter = SentenceSegmenter(self.config.get("tts_first_clause_words", 10), self.config.get("tts_min_clause_words", 4))
+        return Session(session_id, connection, self.history.get(session_id), context, segmenter)
+
+    def close_session(self, session: Session):
+        for scheduler in (self.stt, self.chat, self.tts):
+            scheduler.cancel(session.id)
+        with self.sessions_lock:
+            self.sessions.discard(session.id)
+
+    def handle_connection(self, sock):
+        connection = Connection(sock)
+        session = None
+        chunks = []
+        # Buffered audio is capped at what the bus can hold, the longest utterance a turn accepts anyway
+        buffered = 0
+        overflowed = False
+
+        try:
+            while True:
+                kind, message = connection.receive()
+                if kind is None:
+                    break
+
+                if kind == AUDIO:
+                    if overflowed:
+                        continue
+                    buffered += len(message)
+                    if buffered > self.audio_bus.capacity:
+                        # The rest of the utterance is dropped until its end message
+                        chunks = []
+                        overflowed = True
+                        connection.send_json({"type": "error", "message": f"Utterance longer than the {self.audio_bus.capacity / self.audio_bus.samplerate:.0f}s audio bus"})
+                        continue
+                    chunks.append(message)
+                elif message.get("type") == "hello" and session is None:
+                    session = self.open_session(str(message.get("session") or uuid.uuid4().hex[:8]), connection)
+                    connection.send_json({"type": "ready", "session": session.id, "samplerate": self.voices[0].voice.config.sample_rate})
+                elif message.get("type") == "end" and session is not None:
+                    audio = np.concatenate(chunks).astype(np.float32) / 32768 if chunks else np.zeros(0, dtype=np.float32)
+                    chunks = []
+                    buffered = 0
+                    if overflowed:
+                        overflowed = False
+                        continue
+                    try:
+                        self.turn(session, audio)
+                    except Exception as e:
+                        self.logger.exception(f"Turn failed in session {session.id}")
+                        connection.send_json({"type": "error", "message": str(e)})
+                elif message.get("type") == "bye":
+                    break
+                else:
+                    connection.send_json({"type": "error", "message": f"Unexpected {message.get('type')} message"})
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Connection dropped: {e}")
+            try:
+                connection.send_json({"type": "error", "message": str(e)})
+            except OSError:
+                pass
+        finally:
+            if session is not None:
+                self.close_session(session)
+            connection.close()
+
+    def transcribe(self, supervisor: STTSupervisor, start: int, end: int, turn: int) -> str:
+        # Queued behind other sessions, the span may have been overwritten by the time a worker is free
+        if not self.audio_bus.is_valid(start):
+            raise RuntimeError("Utterance was overwritten before Whisper got to it, raise server_audio_seconds")
+        return supervisor.transcribe(start, end, (end - start) / self.audio_bus.samplerate, turn=turn)
+
+    def speak(self, tts, session: Session, text: str, turn: int, timings: dict, released: float):
+        audio = tts.render(text)
+        if "first_audio" not in timings:
+            timings["first_audio"] = perf_counter() - released
+            self.tracer.emit(turn, "first_audio")
+        session.connection.send_audio(audio)
+
+    def say(self, session: Session, text: str, turn: int, timings: dict, released: float):
+        if "first_sentence" not in timings:
+            timings["first_sentence"] = perf_counter() - released
+            self.tracer.emit(turn, "first_sentence")
+        session.connection.send_json({"type": "text", "text": text, "turn": turn})
+        return self.tts.submit(session.id, lambda tts: self.speak(tts, session, text, turn, timings, released))
+
+    def reply(self, chain, session: Session, text: str, turn: int, timings: dict, released: float) -> tuple:
+        # Holds an LLM slot while streaming; sentences go to the voices as soon as they are complete
+        messages = session.context.fit(session.history.messages + [HumanMessage(content=text)])
+        self.tracer.emit(turn, "llm_submit")
+        session.segmenter.reset()
+        response = ""
+        speech = []
+
+        for chunk in chain.stream(messages):
+            if not chunk.content:
+                continue
+            if "llm_first_token" not in timings:
+                timings["llm_first_token"] = perf_counter() - released
+                self.tracer.emit(turn, "llm_first_token")
+            response += chunk.content
+            for sentence in session.segmenter.feed(chunk.content):
+                speech.append(self.say(session, sentence, turn, timings, released))
+
+        remainder = session.segmenter.flush()
+        if remainder:
+            speech.append(self.say(session, remainder, turn, timings, released))
+        return response, speech
+
+    def turn(self, session: Session, audio: np.ndarray):
+        turn = next(self.turns)
+        released = perf_counter()
+        self.tracer.emit(turn, "key_release")
+        timings = {}
+
+        if len(audio) > self.audio_bus.capacity:
+            raise ValueError(f"Utterance longer than the {self.audio_bus.capacity / self.audio_bus.samplerate:.0f}s audio bus")
+
+        with self.bus_lock:
+            self.audio_bus.write(audio)
+            end = self.audio_bus.write_cursor
+        start = end - len(audio)
+
+        text = self.stt.submit(session.id, lambda supervisor: self.transcribe(supervisor, start, end, turn)).result() if len(audio) else ""
+        timings["stt"] = perf_counter() - released
+        self.tracer.emit(turn, "transcript_ready", audio_seconds=len(audio) / self.audio_bus.samplerate)
+        session.connection.send_json({"type": "transcript", "text": text, "turn": turn})
+
+        if text.strip():
+            response, speech = self.chat.submit(session.id, lambda chain: self.reply(chain, session, text, turn, timings, released)).result()
+            for future in speech:
+                future.result()
+            session.history.add_messages([HumanMessage(content=text), AIMessage(content=response)])
+
+            # Folding rolled-out turns into the summary waits its turn like any other LLM job
+            self.chat.submit(session.id, lambda chain: session.context.summarize())
+
+        timings["turn"] = perf_counter() - released
+        self.tracer.emit(turn, "turn_complete")
+        session.connection.send_json({"type": "done", "turn": turn, "timings": timings})
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8765, unix_path: str = None):
+        if not self.startup.wait_all():
+            self.logger.error(f"Startup failed: {self.startup.status()}")
+            return
+
+        self.servers.append(TCPServer((host, port), SessionHandler))
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.servers.append(UnixServer(unix_path, SessionHandler))
+
+        for server in self.servers:
+            server.app = self
+
+            Thread(target=server.serve_forever, daemon=True).start()
+
+        print(f"Serving sessions on {host}:{port}" + (f" and {unix_path}" if unix_path else ""))
+        try:
+            self.stopped.wait()
+        except KeyboardInterrupt:
+            pass
+
+    def close(self):
+        self.stopped.set()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+        for scheduler in (self.stt, self.chat, self.tts):
+            if scheduler is not None:
+                scheduler.close()
+        for supervisor in self.supervisors:
+            supervisor.close()
+        self.audio_bus.close()
+
+        if self.llm is not None:
+            self.llm.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        self.tracer.close()
+
+def main(argv: list = None):
+    logging.basicConfig(filename="mirai_server.log", level=logging.INFO)
+
+    parser = ArgumentParser(prog="python3 -m mirai serve", description="Serve MirAI sessions to network clients without a microphone or window")
+    parser.add_argument('-c', '--config', type=str, default="config.json", help="Default configuration file")
+    parser.add_argument('-l', '--llm', type=str, help="Model path (.gguf), omit to use a server already listening on base_host:base_port")
+    parser.add_argument('-v', '--voice', required=True, type=str, help="Voice Model File (.onnx)")
+    parser.add_argument('--host', type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument('--unix', type=str, help="Also listen on this Unix socket path")
+    args = parser.parse_args(argv)
+
+    server = SessionServer(args.voice, args.llm, args.config)
+    try:
+        server.serve(args.host, args.port, args.unix)
+    finally:
+        server.close()
@@ -0,0 +1,80 @@
+import logging
+from threading import Event, Lock, Thread
+from time import perf_counter
+
+class Startup:
+    # Loads components on their own threads at once and records when each one became ready
+    def __init__(self, tracer=None):
+        self.logger = logging.getLogger("Startup")
+        self.tracer = tracer
+        self.origin = perf_counter()
+        self.lock = Lock()
+        self.components = {}
+        self.marks = {}
+        self.reported = False
+
+    def add(self, name: str, target):
+        component = {"ready": Event(), "start": None, "end": None, "error": None}
+        with self.lock:
+            self.components[name] = component
+        Thread(target=self.run, args=(name, component, target), daemon=True, name=f"Startup-{name}").start()
+
+    def run(self, name: str, component: dict, target):
+        component["start"] = perf_counter() - self.origin
+        try:
+            target()
+        except Exception as e:
+            component["error"] = str(e)
+            self.logger.exception(f"{name} failed to load")
+        component["end"] = perf_counter() - self.origin
+        component["ready"].set()
+
+        seconds = component["end"] - component["start"]
+        self.logger.info(f"{name} {'failed' if component['error'] else 'ready'} after {seconds:.2f}s")
+        if self.tracer is not None:
+            self.tracer.emit(None, "startup_component", component=name, seconds=seconds, ready_at=component["end"], failed=component["error"] is not None)
+
+        with self.lock:
+            done = not self.reported and all(other["ready"].is_set() for other in self.components.values())
+            self.reported = self.reported or done
+        if done:
+            self.report()
+
+    def mark(self, name: str):
+        # Instants worth seeing next to the components, like the window first drawing
+        self.marks.setdefault(name, perf_counter() - self.origin)
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        component = self.components[name]
+        return component["ready"].wait(timeout) and component["error"] is None
+
+    def require(self, *names: str):
+        for name in names:
+            if not self.wait(name):
+                raise RuntimeError(f"{name} failed to load")
+
+    def wait_all(self, timeout: float = None) -> bool:
+        return all(self.wait(name, timeout) for name in list(self.components))
+
+    def status(self) -> dict:
+        with self.lock:
+            components = list(self.components.items())
+        return {name: "failed" if component["error"] else "ready" if component["ready"].is_set() else "loading" for name, component in components}
+
+    def report(self) -> str:
+        lines = [f"{'component':<12}{'start s':>9}{'ready s':>9}{'took s':>9}"]
+        for name, component in sorted(self.components.items(), key=lambda item: item[1]["end"]):
+            state = "  failed" if component["error"] else ""
+            lines.append(f"{name:<12}{component['start']:>9.2f}{component['end']:>9.2f}{component['end'] - component['start']:>9.2f}{state}")
+        for name, offset in self.marks.items():
+            lines.append(f"{name:<12}{'':>9}{offset:>9.2f}")
+
+        interactive = max(component["end"] for component in self.components.values())
+        lines.append(f"Interactive after {interactive:.2f}s")
+        if self.tracer is not None:
+            self.tracer.emit(None, "startup_ready", seconds=interactive, **{f"{name}_ready_at": component["end"] for name, component in self.components.items()})
+
+        text = "\n".join(lines)
+        self.logger.info(f"Startup breakdown:\n{text}")
+        print(text)
+        return text
@@ -1,22 +1,108 @@
 import logging
-from faster_whisper import WhisperModel
+import string
 from time import time
 
+FALLBACK_TEMPERATURES = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+
+PROFILES = {
+    "greedy-fast": {"model_size": "tiny.en", "compute_type": "int8", "beam_size": 1, "cpu_threads": 4, "temperature": 0.0, "language": "en"},
+    "balanced": {"model_size": "base.en", "compute_type": "int8", "beam_size": 5, "cpu_threads": 4, "temperature": FALLBACK_TEMPERATURES, "language": "en"},
+    "accurate": {"model_size": "small.en", "compute_type": "int8", "beam_size": 5, "cpu_threads": 4, "temperature": FALLBACK_TEMPERATURES, "language": "en"},
+}
+
+def load_profile(name: str = "balanced", custom_profiles: dict = None) -> dict:
+    # Profiles from config.json may define new names or override fields of the built-in ones
+    custom_profiles = custom_profiles or {}
+    if name not in PROFILES and name not in custom_profiles:
+        raise ValueError(f"Unknown STT profile: {name}")
+
+    profile = dict(PROFILES["balanced"])
+    profile.update(PROFILES.get(name, {}))
+    profile.update(custom_profiles.get(name, {}))
+    profile["name"] = name
+    return profile
+
 class STT:
-    def __init__(self, model_size: str = "base.en", device: str = "cpu", compute_type: str = "int8"):
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    def __init__(self, profile: dict = None, device: str = "cpu"):
+        # Imported here so only the Whisper worker processes load CTranslate2, never the main process
+        from faster_whisper import WhisperModel
+
+        self.profile = profile or load_profile()
+        self.model = WhisperModel(self.profile["model_size"], device=device, compute_type=self.profile["compute_type"], cpu_threads=self.profile["cpu_threads"])
         self.logger = logging.getLogger("STT")
-        
-    def transcribe(self, audio_data) -> str:
+        self.logger.info(f"Loaded Whisper {self.profile['model_size']} with the {self.profile['name']} profile")
+
+    def decode(self, audio_data, **kwargs):
+        return self.model.transcribe(audio_data, language=self.profile["language"], beam_size=self.profile["beam_size"], temperature=self.profile["temperature"], vad_filter=True, **kwargs)
+
+    def transcribe(self, audio_data, initial_prompt: str = None) -> str:
         start = time()
 
-        segments, _ = self.model.transcribe(audio_data, language="en", beam_size=5, vad_filter=True)
+        segments, _ = self.decode(audio_data, initial_prompt=initial_prompt)
 
         text = []
         for segment in segments:
             text.append(segment.text)
-        
+
         end = time()
         self.logger.debug(f"Total Processing Time: {end - start}")
 
-        return "".join(text).lstrip()
\ No newline at end of file
+        return "".join(text).lstrip()
+
+    def transcribe_words(self, audio_data, initial_prompt: str = None) -> list:
+        # (start, end, word) with times in seconds from the start of audio_data
+        segments, _ = self.decode(audio_data, initial_prompt=initial_prompt, word_timestamps=True)
+
+        words = []
+        for segment in segments:
+            for word in segment.words:
+                words.append((word.start, word.end, word.word))
+
+        return words
+
+class StreamingTranscriber:
+    def __init__(self, stt: STT, samplerate: int = 16000, min_step: float = 0.5):
+        self.logger = logging.getLogger("StreamingTranscriber")
+        self.stt = stt
+        self.samplerate = samplerate
+        self.min_step = int(min_step * samplerate)
+
+        self.committed = []
+        self.committed_until = 0
+        self.hypothesis = []
+        self.decoded_until = 0
+
+    @staticmethod
+    def normalize(word: str) -> str:
+        return word.strip().lower().strip(string.punctuation)
+
+    def committed_text(self) -> str:
+        return "".join(self.committed).lstrip()
+
+    def update(self, audio) -> tuple:
+        # Re-decodes only the uncommitted tail, returns (committed, tentative) text
+        if len(audio) - self.decoded_until < self.min_step:
+            return self.committed_text(), "".join(word for _, _, word in self.hypothesis)
+
+        self.decoded_until = len(audio)
+        offset = self.committed_until / self.samplerate
+        words = [(start + offset, end + offset, word) for start, end, word in self.stt.transcribe_words(audio[self.committed_until:], initial_prompt=self.committed_text() or None)]
+
+        # Local agreement: words two consecutive hypotheses agree on are stable
+        agreed = 0
+        for previous, current in zip(self.hypothesis, words):
+            if self.normalize(previous[2]) != self.normalize(current[2]):
+                break
+            agreed += 1
+
+        if agreed > 0:
+            self.committed.extend(word for _, _, word in words[:agreed])
+            self.committed_until = min(len(audio), int(words[agreed - 1][1] * self.samplerate))
+            self.logger.debug(f"Committed {agreed} words up to {self.committed_until / self.samplerate:.2f}s")
+
+        self.hypothesis = words[agreed:]
+        return self.committed_text(), "".join(word for _, _, word in self.hypothesis)
+
+    def finalize(self, audio) -> str:
+        tail = self.stt.transcribe(audio[self.committed_until:], initial_prompt=self.committed_text() or None)
+        return f"{self.committed_text()} {tail}".strip()
@@ -0,0 +1,230 @@
+import logging
+import multiprocessing
+from itertools import count
+from queue import Full, Empty
+from threading import Thread
+from time import time, sleep
+from .audiobus import AudioBus
+from .stt import STT, StreamingTranscriber
+from .trace import Tracer
+
+def heartbeat_loop(heartbeat, interval: float):
+    while True:
+        heartbeat.value = time()
+        sleep(interval)
+
+def transcription_listener(audio_bus: AudioBus, submit_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue, partial_queue: multiprocessing.Queue, heartbeat, ready, stream_interval: float = 1.0, profile: dict = None, tracer: Tracer = None):
+    # Beats from its own thread so a decode holding the worker still counts as alive, but a wedged process does not
+    heartbeat.value = time()
+    Thread(target=heartbeat_loop, args=(heartbeat, 0.5), daemon=True).start()
+
+    try:
+        stt = STT(profile)
+        ready.set()
+        pending = None
+
+        while True:
+            if pending is not None:
+                job, kind, start, end, duration, turn = pending
+                pending = None
+            else:
+                job, kind, start, end, duration, turn = submit_queue.get()
+            streamer = None
+
+            if kind == "cancel":
+                continue
+
+            if kind == "stream":
+                # Decode the growing utterance until its final span arrives
+                streamer = StreamingTranscriber(stt, audio_bus.samplerate)
+
+                while True:
+                    try:
+                        message = submit_queue.get(timeout=stream_interval)
+                        break
+                    except Empty:
+                        if not audio_bus.is_valid(start):
+                            continue
+
+                        committed, tentative = streamer.update(audio_bus.view(start, audio_bus.write_cursor))
+                        try:
+                            partial_queue.put_nowait((job, f"{committed}{tentative}"))
+                        except Full:
+                            pass
+
+                # Anything other than the end of this job is handled from scratch
+                if message[0] != job or message[1] != "final":
+                    pending = message
+                    continue
+
+                job, kind, start, end, duration, turn = message
+
+            proc_start = time()
+            if tracer is not None:
+                tracer.emit(turn, "whisper_start", proc_start, streamed=streamer is not None)
+
+            if streamer is not None:
+                text = streamer.finalize(audio_bus.view(start, end))
+            else:
+                text = stt.transcribe(audio_bus.view(start, end))
+
+            if not audio_bus.is_valid(start):
+                logging.getLogger("STT").warning("Audio was overwritten while transcribing")
+
+            result_queue.put((job, text))
+            proc_end = time()
+
+            if tracer is not None:
+                tracer.emit(turn, "whisper_end", proc_end, audio_seconds=duration)
+
+            print(f"Whisper took: {proc_end - proc_start:.3f} seconds for {duration:.3f} seconds audio; Performance is {duration / (proc_end - proc_start) * 100:.3f}% realtime")
+    except KeyboardInterrupt:
+        pass
+
+class Worker:
+    def __init__(self, audio_bus: AudioBus, result_queue: multiprocessing.Queue, partial_queue: multiprocessing.Queue, stream_interval: float, profile: dict, tracer: Tracer):
+        self.queue = multiprocessing.Queue()
+        self.heartbeat = multiprocessing.Value('d', time(), lock=False)
+        self.ready = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=transcription_listener, args=(audio_bus, self.queue, result_queue, partial_queue, self.heartbeat, self.ready, stream_interval, profile, tracer), daemon=True)
+        self.process.start()
+
+    def failure(self, heartbeat_timeout: float) -> str:
+        if self.process.exitcode is not None:
+            return f"exited with code {self.process.exitcode}"
+
+        if time() - self.heartbeat.value > heartbeat_timeout:
+            return f"missed heartbeats for {time() - self.heartbeat.value:.1f} seconds"
+
+        return None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+
+class STTSupervisor:
+    def __init__(self, audio_bus: AudioBus, profile: dict = None, tracer: Tracer = None, standby: bool = False, stream_interval: float = 1.0, deadline_factor: float = 2.0, deadline_min: float = 5.0, heartbeat_timeout: float = 5.0, load_timeout: float = 120.0):
+        self.logger = logging.getLogger("STTSupervisor")
+        self.audio_bus = audio_bus
+        self.profile = profile
+        self.tracer = tracer
+        self.standby_enabled = standby
+        self.stream_interval = stream_interval
+        self.deadline_factor = deadline_factor
+        self.deadline_min = deadline_min
+        self.heartbeat_timeout = heartbeat_timeout
+        self.load_timeout = load_timeout
+
+        self.result_queue = multiprocessing.Queue()
+        self.partial_queue = multiprocessing.Queue(maxsize=4)
+        self.jobs = count(1)
+
+        self.active = None
+        self.standby = None
+
+    def start(self):
+        self.active = self.spawn()
+        if self.standby_enabled:
+            self.standby = self.spawn()
+
+    def spawn(self) -> Worker:
+        worker = Worker(self.audio_bus, self.result_queue, self.partial_queue, self.stream_interval, self.profile, self.tracer)
+        self.logger.info(f"Started Whisper worker {worker.process.pid}")
+        return worker
+
+    def replace_active(self, reason: str):
+        self.logger.error(f"Whisper worker {self.active.process.pid} {reason}, replacing it")
+        self.active.kill()
+
+        # A warm standby takes over immediately, otherwise the replacement has to load first
+        if self.standby is not None and self.standby.failure(self.heartbeat_timeout) is None:
+            self.active = self.standby
+            self.standby = self.spawn()
+        else:
+            if self.standby is not None:
+                self.standby.kill()
+                self.standby = self.spawn() if self.standby_enabled else None
+            self.active = self.spawn()
+
+    def check(self):
+        # Cheap health pass for idle ticks, so a crash is replaced before the next utterance needs it
+        if self.active is not None:
+            reason = self.active.failure(self.heartbeat_timeout)
+            if reason is not None:
+                self.replace_active(reason)
+
+        if self.standby is not None and self.standby.failure(self.heartbeat_timeout) is not None:
+            self.logger.error(f"Standby Whisper worker {self.standby.process.pid} died, respawning")
+            self.standby.kill()
+            self.standby = self.spawn()
+
+    def stream(self, start: int, turn: int = None) -> int:
+        job = next(self.jobs)
+        self.active.queue.put((job, "stream", start, None, None, turn))
+        return job
+
+    def cancel(self, job: int):
+        self.active.queue.put((job, "cancel", None, None, None, None))
+
+    def partials(self, wait: float = 0.0) -> list:
+        # Blocks up to wait seconds for the first partial, then drains whatever else is queued
+        results = []
+        try:
+            results.append(self.partial_queue.get(timeout=wait) if wait > 0 else self.partial_queue.get_nowait())
+        except Empty:
+            return results
+
+        while True:
+            try:
+                results.append(self.partial_queue.get_nowait())
+            except Empty:
+                return results
+
+    def wait_result(self, worker: Worker, job: int, duration: float) -> tuple:
+        # Returns (text, None) on success or (None, reason) once the worker is judged dead or too slow
+        load_deadline = time() + self.load_timeout
+        while not worker.ready.wait(0.1):
+            reason = worker.failure(self.heartbeat_timeout)
+            if reason is not None:
+                return None, reason
+            if time() > load_deadline:
+                return None, f"did not load within {self.load_timeout:.0f} seconds"
+
+        deadline = time() + max(self.deadline_min, duration * self.deadline_factor)
+        while time() < deadline:
+            try:
+                result_job, text = self.result_queue.get(timeout=0.1)
+            except Empty:
+                reason = worker.failure(self.heartbeat_timeout)
+                if reason is not None:
+                    return None, reason
+                continue
+
+            if result_job == job:
+                return text, None
+
+            self.logger.debug(f"Dropping stale result for job {result_job}")
+
+        return None, f"missed its {max(self.deadline_min, duration * self.deadline_factor):.1f} second deadline"
+
+    def transcribe(self, start: int, end: int, duration: float, job: int = None, turn: int = None, attempts: int = 2) -> str:
+        # A streamed job finalizes on the worker that holds its stream, retries always start from scratch
+        if job is None:
+            job = next(self.jobs)
+
+        for _ in range(attempts):
+            self.active.queue.put((job, "final", start, end, duration, turn))
+            text, reason = self.wait_result(self.active, job, duration)
+            if reason is None:
+                return text
+
+            self.replace_active(reason)
+            job = next(self.jobs)
+
+        raise RuntimeError(f"Whisper failed {attempts} times transcribing {duration:.1f} seconds of audio")
+
+    def close(self):
+        for worker in (self.active, self.standby):
+            if worker is not None:
+                worker.process.terminate()
+                worker.process.join()
@@ -0,0 +1,172 @@
+import json
+import logging
+import multiprocessing
+import os
+import numpy as np
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Full
+from threading import Lock, Thread
+from time import time
+
+# Span name -> (start event, end event), both stamped with the same turn ID
+SPANS = {
+    "audio_drain": ("key_release", "audio_drained"),
+    "whisper": ("whisper_start", "whisper_end"),
+    "stt": ("key_release", "transcript_ready"),
+    "llm_first_token": ("llm_submit", "llm_first_token"),
+    "first_sentence": ("llm_submit", "first_sentence"),
+    "tts_first_audio": ("first_sentence", "first_audio"),
+    "release_to_audio": ("key_release", "first_audio"),
+    "turn": ("key_release", "turn_complete"),
+}
+
+class Histogram:
+    def __init__(self, window: int = 200):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, quantiles=(0.5, 0.9, 0.99)) -> dict:
+        if len(self.values) == 0:
+            return {}
+        return dict(zip(quantiles, np.quantile(np.fromiter(self.values, dtype=np.float64), quantiles)))
+
+class Tracer:
+    def __init__(self, path: str = "trace.jsonl", window: int = 200, max_turns: int = 32):
+        self.logger = logging.getLogger("Tracer")
+        self.path = path
+        self.window = window
+        self.max_turns = max_turns
+
+        # Any process may emit; only the process that called start() collects
+        self.queue = multiprocessing.Queue(maxsize=4096)
+        self.turns = OrderedDict()
+        self.histograms = {name: Histogram(window) for name in SPANS}
+        self.lock = Lock()
+        self.collector = None
+        self.file = None
+
+    def __getstate__(self):
+        return {"path": self.path, "window": self.window, "max_turns": self.max_turns, "queue": self.queue}
+
+    def __setstate__(self, state):
+        # Child processes only emit, so they carry the queue and none of the collector state
+        self.__dict__.update(state)
+        self.logger = logging.getLogger("Tracer")
+        self.turns = OrderedDict()
+        self.histograms = {}
+        self.lock = Lock()
+        self.collector = None
+        self.file = None
+
+    def emit(self, turn, event: str, timestamp: float = None, **attributes):
+        # Never blocks the pipeline; a full queue just loses the event
+        try:
+            self.queue.put_nowait((turn, event, timestamp or time(), os.getpid(), attributes))
+        except Full:
+            pass
+
+    def start(self):
+        if self.path is not None:
+            self.file = open(self.path, 'a', buffering=1)
+
+        self.collector = Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def write(self, record: dict):
+        if self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+
+    def collect(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+
+            turn, event, timestamp, pid, attributes = message
+            self.write({"type": "event", "turn": turn, "event": event, "t": timestamp, "pid": pid, **attributes})
+            if turn is None:
+                continue
+
+            with self.lock:
+                events = self.turns.setdefault(turn, {})
+                self.turns.move_to_end(turn)
+                while len(self.turns) > self.max_turns:
+                    self.turns.popitem(last=False)
+
+                # Only the first occurrence of an event in a turn counts
+                if event in events:
+                    continue
+                events[event] = timestamp
+
+                for name, (start_event, end_event) in SPANS.items():
+                    if event == end_event and start_event in events:
+                        duration = timestamp - events[start_event]
+                        self.histograms[name].add(duration)
+                        self.write({"type": "span", "turn": turn, "span": name, "start": events[start_event], "end": timestamp, "duration": duration})
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {name: {"count": histogram.count, "sum": histogram.total, "quantiles": histogram.quantiles()} for name, histogram in self.histograms.items()}
+
+    def close(self):
+        if self.collector is not None:
+            self.queue.put(None)
+            self.collector.join(timeout=1.0)
+
+        if self.file is not None:
+            self.file.close()
+
+class MetricsServer:
+    # Rolling span histograms at /metrics (Prometheus text) and /metrics.json
+    def __init__(self, tracer: Tracer, host: str = "127.0.0.1", port: int = 9100):
+        self.logger = logging.getLogger("MetricsServer")
+        self.tracer = tracer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                metrics.logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/metrics.json":
+                    body = json.dumps(metrics.tracer.snapshot()).encode()
+                    content_type = "application/json"
+                elif self.path == "/metrics":
+                    body = metrics.prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def prometheus(self) -> str:
+        lines = ["# TYPE mirai_span_seconds summary"]
+        for name, stats in self.tracer.snapshot().items():
+            for quantile, value in stats["quantiles"].items():
+                lines.append(f'mirai_span_seconds{{span="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'mirai_span_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'mirai_span_seconds_count{{span="{name}"}} {stats["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,232 @@
+import json
+import logging
+import multiprocessing
+import os
+import numpy as np
+from argparse import ArgumentParser
+from glob import glob
+from queue import Empty
+from time import perf_counter
+from .recorder import FORMATS, open_recording
+from .resample import StreamingResampler
+from .stt import STT, load_profile
+
+def quiet_point(audio: np.ndarray, samplerate: int, search: float = 5.0, window: float = 0.1) -> int:
+    # Cuts chunks in the quietest part of their last few seconds (at most the last quarter), so a word is rarely split in two
+    size = int(window * samplerate)
+    tail = audio[len(audio) - min(int(search * samplerate), len(audio) // 4):]
+    windows = len(tail) // size
+    if windows < 2:
+        return len(audio)
+    blocks = tail[len(tail) - windows * size:].reshape(windows, size)
+    quietest = int(np.argmin(np.einsum('ij,ij->i', blocks, blocks)))
+    return len(audio) - (windows - quietest) * size + size // 2
+
+class BulkTranscriber:
+    # Offline transcription: faster-whisper's batched pipeline decodes many speech segments of a chunk at once
+    def __init__(self, profile: dict, batch_size: int = 8, chunk_seconds: float = 300.0):
+        self.logger = logging.getLogger("BulkTranscriber")
+        self.stt = STT(profile)
+        self.profile = self.stt.profile
+        self.batch_size = batch_size
+        self.chunk_seconds = chunk_seconds
+
+        try:
+            from faster_whisper import BatchedInferencePipeline
+            self.batched = BatchedInferencePipeline(model=self.stt.model)
+        except ImportError:
+            self.logger.warning("faster-whisper has no BatchedInferencePipeline (needs 1.1 or newer), decoding one segment at a time")
+            self.batched = None
+
+    def decode(self, audio: np.ndarray) -> list:
+        if self.batched is not None:
+            segments, _ = self.batched.transcribe(audio, language=self.profile["language"], beam_size=self.profile["beam_size"], temperature=self.profile["temperature"], batch_size=self.batch_size)
+        else:
+            segments, _ = self.stt.decode(audio)
+        return list(segments)
+
+    def transcribe_file(self, path: str, offset: int = 0):
+        # Reads the recording a chunk at a time from offset (in source frames); yields one record per chunk
+        with open_recording(path) as file:
+            samplerate = file.samplerate
+            chunk_frames = int(self.chunk_seconds * samplerate)
+            file.seek(offset)
+            position = offset
+            carry = np.zeros(0, dtype=np.float32)
+
+            while True:
+                block = file.read(chunk_frames - len(carry), dtype='float32', always_2d=True)[:, 0]
+                audio = np.concatenate([carry, block])
+                last = len(block) < chunk_frames - len(carry)
+                if len(audio) == 0:
+                    return
+
+                cut = len(audio) if last else quiet_point(audio, samplerate)
+                piece, carry = audio[:cut], audio[cut:]
+                if samplerate != 16000:
+                    piece = StreamingResampler(samplerate, 16000).process(piece).copy()
+
+                start = position / samplerate
+                yield {
+                    "offset": position,
+                    "end_offset": position + cut,
+                    "start": round(start, 3),
+                    "end": round((position + cut) / samplerate, 3),
+                    "segments": [{"start": round(start + segment.start, 3), "end": round(start + segment.end, 3), "text": segment.text.strip()} for segment in self.decode(piece)],
+                }
+                position += cut
+
+                if last and len(carry) == 0:
+                    return
+
+def transcription_worker(tasks: multiprocessing.Queue, results: multiprocessing.Queue, profile: dict, batch_size: int, chunk_seconds: float):
+    # The model loads once per process; every file it takes streams back chunk by chunk
+    transcriber = BulkTranscriber(profile, batch_size, chunk_seconds)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        source = {"file": task["file"], "size": task["size"], "mtime": task["mtime"]}
+        try:
+            for record in transcriber.transcribe_file(task["file"], task["offset"]):
+                results.put(("chunk", {**source, **record}))
+            results.put(("done", source))
+        except Exception as e:
+            results.put(("error", {**source, "error": str(e)}))
+
+def load_progress(output: str) -> dict:
+    # (file, size, mtime) -> {"offset", "done"} from the records already written; a torn last line is cut off
+    progress = {}
+    if not os.path.exists(output):
+        return progress
+
+    valid = 0
+    with open(output, 'rb') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid += len(line)
+
+            state = progress.setdefault((record["file"], record["size"], record["mtime"]), {"offset": 0, "done": False})
+            if record.get("done"):
+                state["done"] = True
+            else:
+                state["offset"] = max(state["offset"], record["end_offset"])
+
+    if valid != os.path.getsize(output):
+        with open(output, 'r+b') as file:
+            file.truncate(valid)
+    return progress
+
+def find_recordings(paths: list) -> list:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(match for extension in FORMATS.values() for match in glob(os.path.join(path, f"*{extension}")))
+        else:
+            found.append(path)
+    # Absolute, so a resumed run matches its records whatever directory it starts from
+    return sorted(os.path.abspath(path) for path in found)
+
+def main(argv: list = None):
+    parser = ArgumentParser(prog="python3 -m mirai transcribe", description="Transcribe recordings from --record mode into resumable JSONL")
+    parser.add_argument('recordings', nargs='*', default=["out/recordings"], help="Recordings or directories of them")
+    parser.add_argument('-o', '--output', type=str, default="out/transcripts.jsonl", help="JSONL output, resumed if it exists")
+    parser.add_argument('-c', '--config', type=str, default="config.json", help="Configuration file with custom stt_profiles")
+    parser.add_argument('-p', '--profile', type=str, default="balanced", help="Whisper decoding profile")
+    parser.add_argument('--beam-size', type=int, help="Override the profile's beam size")
+    parser.add_argument('-t', '--threads', type=int, default=2, help="CPU threads per worker process")
+    parser.add_argument('-j', '--workers', type=int, help="Worker processes, defaults to CPU count / threads")
+    parser.add_argument('-b', '--batch-size', type=int, default=8, help="Speech segments decoded together")
+    parser.add_argument('--chunk', type=float, default=300.0, help="Seconds of audio read from a recording at a time")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    custom_profiles = {}
+    try:
+        with open(args.config, 'r') as file:
+            custom_profiles = json.load(file).get("stt_profiles", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    profile = load_profile(args.profile, custom_profiles)
+    profile["cpu_threads"] = args.threads
+    if args.beam_size is not None:
+        profile["beam_size"] = args.beam_size
+
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    progress = load_progress(output)
+
+    tasks = multiprocessing.Queue()
+    pending = set()
+    skipped = 0
+    for path in find_recordings(args.recordings):
+        stat = os.stat(path)
+        state = progress.get((path, stat.st_size, stat.st_mtime_ns), {"offset": 0, "done": False})
+        if state["done"]:
+            skipped += 1
+            continue
+        pending.add(path)
+        tasks.put({"file": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "offset": state["offset"]})
+
+    if skipped:
+        print(f"Skipping {skipped} recordings already in {args.output}")
+    if not pending:
+        print("Nothing to transcribe")
+        return
+
+    workers = min(len(pending), args.workers or max(1, (os.cpu_count() or 1) // args.threads))
+    print(f"Transcribing {len(pending)} recordings with {workers} workers x {args.threads} threads, batch size {args.batch_size}")
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=transcription_worker, args=(tasks, results, profile, args.batch_size, args.chunk), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+        tasks.put(None)
+
+    start = perf_counter()
+    audio_seconds = 0.0
+    failed = 0
+
+    with open(output, 'a') as file:
+        while pending:
+            try:
+                kind, record = results.get(timeout=1.0)
+            except Empty:
+                if not any(process.is_alive() for process in processes):
+                    print(f"All workers exited with {len(pending)} recordings unfinished")
+                    break
+                continue
+
+            if kind == "chunk":
+                # Each line is a checkpoint: a restart continues from the furthest end_offset of each file
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+                audio_seconds += record["end"] - record["start"]
+                continue
+
+            pending.discard(record["file"])
+            if kind == "done":
+                file.write(json.dumps({**record, "done": True}) + "\n")
+                file.flush()
+                print(f"{os.path.basename(record['file'])} done, {len(pending)} left, {audio_seconds / max(perf_counter() - start, 1e-9):.1f} audio-hours per hour so far")
+            else:
+                failed += 1
+                print(f"{os.path.basename(record['file'])} failed: {record['error']}")
+
+    elapsed = perf_counter() - start
+    for process in processes:
+        process.join(timeout=5)
+
+    print(f"{audio_seconds / 3600:.2f} audio hours in {elapsed / 3600:.2f} hours: {audio_seconds / max(elapsed, 1e-9):.1f} audio-hours per hour" + (f", {failed} failed" if failed else ""))
+
+if __name__ == "__main__":
+    main()
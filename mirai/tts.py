@@ -1,23 +1,228 @@
+import hashlib
 import logging
+import os
 import numpy as np
 import sounddevice as sd
+from queue import Queue, Empty
+from threading import Event, Lock, Thread
 from piper.voice import PiperVoice
 
 class TTS:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, sink=None, tracer=None, buffer_chunks: int = 8, slice_duration: float = 0.1, cache=None, playback: bool = True):
         self.logger = logging.getLogger("TTS")
+        self.tracer = tracer
+        self.traced_turn = None
         self.voice = PiperVoice.load(model_path)
-        self.stream = sd.OutputStream(samplerate=self.voice.config.sample_rate, channels=1, dtype='int16')
-        self.stream.start()
+
+        # Cached PCM is only valid for the exact voice file and synthesis settings that produced it
+        self.cache = cache
+        config = self.voice.config
+        settings = [getattr(config, name, None) for name in ("sample_rate", "length_scale", "noise_scale", "noise_w")]
+        stat = os.stat(model_path)
+        self.voice_key = f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{settings}"
+
+        # Anything with the OutputStream write/start/stop/close interface can stand in for the speaker
+        self.playback = playback
+        if playback and sink is None:
+            sink = sd.OutputStream(samplerate=self.voice.config.sample_rate, channels=1, dtype='int16')
+        self.stream = sink
+
+        # Sentences -> synthesis worker -> bounded PCM queue -> playback worker
+        self.sentences = Queue()
+        self.pcm = Queue(maxsize=buffer_chunks)
+        self.slice = int(slice_duration * self.voice.config.sample_rate)
+
+        # Bumped by cancel(); queued work from an older generation is dropped
+        self.generation = 0
+        self.pending = 0
+        # Every sentence gets a sequence number; flush() skips those in (skip_from, skip_to]
+        self.sequence = 0
+        self.playing = 0
+        self.skip_from = 0
+        self.skip_to = 0
+        self.lock = Lock()
+        self.synthesis_lock = Lock()
+        self.drained = Event()
+        self.drained.set()
+
+        # Text of the turn sentences that finished playing, for recording what was actually heard
+        self.spoken = []
+
+        # Without playback the caller takes rendered audio and no speaker or workers are set up
+        self.synthesis_thread = Thread(target=self.synthesis_worker, daemon=True)
+        self.playback_thread = Thread(target=self.playback_worker, daemon=True)
+        if playback:
+            self.stream.start()
+            self.synthesis_thread.start()
+            self.playback_thread.start()
         self.logger.info(f"Voice Model Loaded from {model_path}")
-    
-    def say(self, text: str):
-        self.logger.debug(f"Printing \"{text}\"")
 
-        # We want to synthesize at max speed, so no silence
-        for audio_bytes in self.voice.synthesize_stream_raw(text):
-            self.stream.write(np.frombuffer(audio_bytes, dtype=np.int16))
+    def say(self, text: str, turn: int = None):
+        # Returns immediately; the sentence is spoken after everything queued before it
+        self.logger.debug(f"Queueing \"{text}\"")
+        with self.lock:
+            self.pending += 1
+            self.drained.clear()
+            generation = self.generation
+            self.sequence += 1
+            sequence = self.sequence
+        self.sentences.put((generation, sequence, text, turn))
+
+    def cache_key(self, text: str) -> str:
+        normalized = " ".join(text.split()).casefold()
+        return hashlib.sha1(f"{self.voice_key}|{normalized}".encode()).hexdigest()
+
+    def synthesize(self, text: str) -> np.ndarray:
+        with self.synthesis_lock:
+            return np.frombuffer(b"".join(self.voice.synthesize_stream_raw(text)), dtype=np.int16)
+
+    def render(self, text: str) -> np.ndarray:
+        # Whole-sentence synthesis through the cache, for callers that send the audio elsewhere
+        key = self.cache_key(text) if self.cache is not None and self.cache.cacheable(text) else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        audio = self.synthesize(text)
+        if key is not None and len(audio) > 0:
+            self.cache.put(key, audio)
+        return audio
+
+    def prewarm(self, phrases: list):
+        # Synthesized in the background at startup so fixed prompts never wait on Piper
+        def worker():
+            for text in phrases:
+                key = self.cache_key(text)
+                if self.cache.get(key) is None:
+                    self.cache.put(key, self.synthesize(text), persist=True)
+            self.logger.info(f"Pre-warmed {len(phrases)} phrases")
+
+        if self.cache is not None and phrases:
+            Thread(target=worker, daemon=True).start()
+
+    def skipped(self, generation: int, sequence: int) -> bool:
+        return generation != self.generation or self.skip_from < sequence <= self.skip_to
+
+    def finished(self, generation: int):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.playing = 0
+            self.pending -= 1
+            if self.pending == 0:
+                self.drained.set()
+
+    def synthesis_worker(self):
+        while True:
+            item = self.sentences.get()
+            if item is None:
+                self.pcm.put(None)
+                return
+
+            generation, sequence, text, turn = item
+            if self.skipped(generation, sequence):
+                continue
+
+            key = None
+            if self.cache is not None and self.cache.cacheable(text):
+                key = self.cache_key(text)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.pcm.put((generation, sequence, cached, turn, True, text))
+                    continue
+
+            # We want to synthesize at max speed, so no silence; each chunk plays as soon as it exists
+            chunks = []
+            previous = None
+            with self.synthesis_lock:
+                for audio_bytes in self.voice.synthesize_stream_raw(text):
+                    if self.skipped(generation, sequence):
+                        break
+                    if previous is not None:
+                        self.pcm.put((generation, sequence, previous, turn, False, None))
+                    previous = np.frombuffer(audio_bytes, dtype=np.int16)
+                    chunks.append(previous)
+                else:
+                    self.pcm.put((generation, sequence, previous if previous is not None else np.zeros(0, dtype=np.int16), turn, True, text))
+
+                    if key is not None and chunks:
+                        self.cache.put(key, np.concatenate(chunks))
+
+    def playback_worker(self):
+        while True:
+            item = self.pcm.get()
+            if item is None:
+                return
+
+            generation, sequence, audio, turn, last, text = item
+            with self.lock:
+                if self.skipped(generation, sequence):
+                    continue
+                self.playing = sequence
+
+            if self.tracer is not None and turn is not None and self.traced_turn != turn and generation == self.generation:
+                self.traced_turn = turn
+                self.tracer.emit(turn, "first_audio")
+
+            # Written in short slices so a cancel cuts speech off within one slice
+            for i in range(0, len(audio), self.slice):
+                if self.skipped(generation, sequence):
+                    break
+                self.stream.write(audio[i:i + self.slice])
+
+            if last:
+                if turn is not None and generation == self.generation:
+                    self.spoken.append(text)
+                self.finished(generation)
+
+    def drop_queued(self):
+        for queue in (self.sentences, self.pcm):
+            while True:
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    break
+
+    def flush(self):
+        # Drops every sentence after the one playing, which keeps all of its audio and still counts as spoken
+        with self.lock:
+            self.skip_from = self.playing
+            self.skip_to = self.sequence
+            self.pending = 1 if self.playing else 0
+            if self.pending == 0:
+                self.drained.set()
+            while True:
+                try:
+                    self.sentences.get_nowait()
+                except Empty:
+                    break
+
+    def cancel(self):
+        # Drops every queued and playing sentence, playback stops within one slice
+        with self.lock:
+            self.generation += 1
+            self.playing = 0
+            self.pending = 0
+            self.drained.set()
+            self.drop_queued()
+
+    def take_spoken(self) -> list:
+        spoken = self.spoken
+        self.spoken = []
+        return spoken
+
+    def wait_drained(self, timeout: float = None) -> bool:
+        return self.drained.wait(timeout)
 
     def close(self):
+        if not self.playback:
+            return
+
+        self.cancel()
+        self.sentences.put(None)
+        self.synthesis_thread.join()
+        self.playback_thread.join()
+
         self.stream.stop()
-        self.stream.close()
\ No newline at end of file
+        self.stream.close()
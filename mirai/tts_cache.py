@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import numpy as np
+from collections import OrderedDict
+from threading import Lock
+
+class PCMCache:
+    def __init__(self, directory: str = None, max_bytes: int = 32 * 1024 * 1024, max_chars: int = 160):
+        self.logger = logging.getLogger("PCMCache")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+
+        self.lock = Lock()
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Disk store: one append-only int16 file, memory-mapped at startup, plus a JSON index of key -> (offset, length)
+        self.index = {}
+        self.mapped = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.data_path = os.path.join(directory, "pcm.bin")
+            self.index_path = os.path.join(directory, "index.json")
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r') as file:
+                self.index = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            self.logger.debug(f"Starting an empty disk cache: {e}")
+            self.index = {}
+
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > 0:
+            self.mapped = np.memmap(self.data_path, dtype=np.int16, mode='r')
+
+        # Entries past the end of the data file are from an interrupted write
+        size = 0 if self.mapped is None else len(self.mapped)
+        self.index = {key: span for key, span in self.index.items() if span[0] + span[1] <= size}
+        self.logger.info(f"Mapped {len(self.index)} cached phrases from {self.directory}")
+
+    def on_disk(self, key: str) -> bool:
+        # Phrases persisted during this run are past the end of the map until the next start
+        span = self.index.get(key)
+        return span is not None and self.mapped is not None and span[0] + span[1] <= len(self.mapped)
+
+    def cacheable(self, text: str) -> bool:
+        return len(text) <= self.max_chars
+
+    def get(self, key: str) -> np.ndarray:
+        with self.lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+
+                # Phrases go to disk once they repeat, one-off sentences stay in memory
+                if self.directory is not None and key not in self.index:
+                    self.persist(key, audio)
+                return audio
+
+            if self.on_disk(key):
+                span = self.index[key]
+                self.hits += 1
+                return self.mapped[span[0]:span[0] + span[1]]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, audio: np.ndarray, persist: bool = False):
+        with self.lock:
+            if key in self.memory or self.on_disk(key):
+                return
+
+            if audio.nbytes <= self.max_bytes:
+                self.memory[key] = audio
+                self.memory_bytes += audio.nbytes
+                while self.memory_bytes > self.max_bytes:
+                    _, evicted = self.memory.popitem(last=False)
+                    self.memory_bytes -= evicted.nbytes
+
+            if persist and self.directory is not None and key not in self.index:
+                self.persist(key, audio)
+
+    def persist(self, key: str, audio: np.ndarray):
+        audio = audio.astype(np.int16)
+        with open(self.data_path, 'ab') as file:
+            offset = file.tell() // audio.itemsize
+            file.write(audio.tobytes())
+
+        # Readable from the memory LRU until the next start maps it; once evicted, put() keeps it in memory again
+        self.index[key] = (offset, len(audio))
+        temporary = self.index_path + ".tmp"
+        with open(temporary, 'w') as file:
+            json.dump(self.index, file)
+        os.replace(temporary, self.index_path)
@@ -1,27 +1,21 @@
 import customtkinter as ctk
-import os
 import random
 import sys
-from time import sleep, time
-from PIL import Image
+from .images import ImageLibrary
 
 class UI:
-    def __init__(self):
+    def __init__(self, refresh_interval: int = 50):
         self.running = True
+        self.refresh_interval = refresh_interval
+        self.shown = {}
 
-    def load_images(self, folder_path, image_size):
-        images = []
-
-        for file in os.listdir(folder_path):
-            if file.lower().endswith(".webp"): # TODO: Support other image formats
-                try:
-                    img = Image.open(os.path.join(folder_path, file))
-                    img = img.resize(image_size, Image.Resampling.LANCZOS)
-                    images.append(ctk.CTkImage(light_image=img, size=image_size))
-                except Exception as e:
-                    print(f"Error loading {file}: {e}")
-        
-        return images
+    def update(self, widget, **options):
+        # Reconfigures a widget only when an option actually changed
+        changed = {name: value for name, value in options.items() if self.shown.get((id(widget), name)) != value}
+        if changed:
+            widget.configure(**changed)
+            for name, value in changed.items():
+                self.shown[(id(widget), name)] = value
 
     def close(self):
         self.exit_app()
@@ -52,7 +46,11 @@ class UI:
         app.attributes('-fullscreen', True)
         app.configure(fg_color="#101010") 
 
-        images = self.load_images(image_path, (340, 340))
+        # Only the first avatar is decoded before the window opens, each next one in the background
+        image_size = (340, 340)
+        library = ImageLibrary(image_path, image_size)
+        shown = {"current": library.choose()}
+        shown["upcoming"] = library.choose(exclude=shown["current"])
  
         bottom_frame = ctk.CTkFrame(app, fg_color="#101010")
         bottom_frame.pack(side='bottom', fill='x')
@@ -107,69 +105,77 @@ class UI:
         
         label = ctk.CTkLabel(app, text="")
         label.place(relx=0.5, anchor="n")
-        new_img = random.choice(images)
-        label.configure(image=new_img)
+
+        def show(path):
+            image = library.get(path) if path is not None else None
+            if image is not None:
+                label.configure(image=ctk.CTkImage(light_image=image, size=image_size))
+
+        show(shown["current"])
+        if shown["upcoming"] is not None:
+            library.prefetch(shown["upcoming"])
+
+        # Tk's own loop drives everything; the pipeline state is sampled on a timer and only changes reach the widgets
+        def refresh():
+            if not self.running or not core.running.is_set():
+                app.quit()
+                return
+
+            listening = core.listening.is_set()
+            self.update(cheat_button, fg_color="green" if core.model is not None and core.model.cheat_mode else "red")
+
+            if listening:
+                self.update(status_label, text="Listening...")
+                if len(core.partial_transcript) != 0:
+                    self.update(sublabel_1, text=UI.get_history(core.partial_transcript))
+                else:
+                    self.update(sublabel_1, text="Text appears here when submitted.")
+                self.update(ptt_button, fg_color="green", hover_color="dark green")
+            else:
+                self.update(ptt_button, fg_color="red", hover_color="dark red")
+
+            # Push-to-talk works as soon as Whisper is up; a turn waits for whatever else is still loading
+            loading = [name if state == "loading" else f"{name} ({state})" for name, state in core.startup.status().items() if state != "ready"]
+            if not listening and len(core.transcribed) == 0 and loading:
+                self.update(status_label, text=f"Loading {', '.join(loading)}...")
+            elif not listening and len(core.transcribed) == 0:
+                self.update(status_label, text="Started!")
+
+            if not listening and len(core.transcribed) != 0:
+                self.update(status_label, text="Thinking about what you said:")
+
+                if len(core.response_buffer) == 0:
+                    self.update(sublabel_1, text=UI.get_history(core.transcribed))
+                else:
+                    self.update(sublabel_1, text=UI.get_history(core.response_buffer))
+
+            app.after(self.refresh_interval, refresh)
+
+        def change_image():
+            show(shown["upcoming"])
+            shown["current"] = shown["upcoming"]
+            shown["upcoming"] = library.choose(exclude=shown["current"])
+            if shown["upcoming"] is not None:
+                library.prefetch(shown["upcoming"])
+            app.after(int(random.uniform(min_interval, max_interval) * 1000), change_image)
 
         min_interval = 10
         max_interval = 20
 
-        countdown = random.uniform(min_interval, max_interval)
-        start_time = time()
-        curr_time = time()
-        while core.shared_state["running"]:
-            try:
-                app.update_idletasks()
-                app.update()
-
-                core.shared_state["running"] = self.running
-                curr_time = time()
-                if (curr_time - start_time) > countdown:
-                    new_img = random.choice(images)
-                    label.configure(image=new_img)
-                    start_time = curr_time
-                    countdown = random.uniform(min_interval, max_interval)
-
-                if core.model.cheat_mode:
-                    cheat_button.configure(fg_color="green")
-                else:
-                    cheat_button.configure(fg_color="red")
+        app.after(0, refresh)
+        app.after_idle(lambda: core.startup.mark("window"))
+        app.after(int(random.uniform(min_interval, max_interval) * 1000), change_image)
 
-                if core.shared_state["listening"]:
-                    status_label.configure(text="Listening...")
-                    sublabel_1.configure(text="Text appears here when submitted.")
-                    ptt_button.configure(fg_color="green", hover_color="dark green")
-                else:
-                    ptt_button.configure(fg_color="red", hover_color="dark red")
-
-                if not core.shared_state["listening"] and len(core.transcribed) != 0:
-                    status_label.configure(text="Thinking about what you said:")
-
-                    if len(core.response_buffer) == 0:
-                        sublabel_1.configure(text=UI.get_history(core.transcribed))
-                    else:
-                        sublabel_1.configure(text=UI.get_history(core.response_buffer))
-
-                sleep(0.01)
-            except KeyboardInterrupt:
-                self.running = False
-                try:
-                    core.shared_state["running"] = False
-                except:
-                    pass
-
-                break
-            except Exception as e:
-                print(f"Error: {e}")
-                self.running = False
-                try:
-                    core.shared_state["running"] = False
-                except:
-                    pass
-                
-                break
-        
-        if core.shared_state["running"]:
-            core.shared_state["running"] = self.running
+        try:
+            app.mainloop()
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"Error: {e}")
+
+        self.running = False
+        core.shutdown()
+        library.close()
         app.destroy()
 
         core.invoker_thread.join()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import logging
+import numpy as np
+
+class VAD:
+    def __init__(self, samplerate: int = 16000, frame_duration: float = 0.02, threshold_db: float = 12.0, min_energy_db: float = -45.0, onset: float = 0.06, hangover: float = 0.8, pad: float = 0.2):
+        self.logger = logging.getLogger("VAD")
+        self.samplerate = samplerate
+        self.frame = int(frame_duration * samplerate)
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.onset_frames = max(1, round(onset / frame_duration))
+        self.hangover_frames = max(1, round(hangover / frame_duration))
+        self.pad = int(pad * samplerate)
+
+        self.reset()
+
+    def reset(self, position: int = 0):
+        self.position = position
+        self.noise_db = self.min_energy_db - self.threshold_db
+        self.noise_frames = 0
+        self.speaking = False
+        self.speech_run = 0
+        self.silence_run = 0
+        self.last_speech = position
+
+    def frame_energies(self, audio: np.ndarray) -> np.ndarray:
+        frames = len(audio) // self.frame
+        blocks = audio[:frames * self.frame].reshape(frames, self.frame)
+        return 10 * np.log10(np.einsum('ij,ij->i', blocks, blocks) / self.frame + 1e-10)
+
+    def feed(self, audio: np.ndarray) -> tuple:
+        # Consumes whole frames only; returns (samples consumed, [(event, position)])
+        energies = self.frame_energies(audio)
+        events = []
+
+        for energy in energies:
+            speech = energy > max(self.noise_db + self.threshold_db, self.min_energy_db)
+
+            if speech:
+                self.speech_run += 1
+                self.silence_run = 0
+                self.last_speech = self.position + self.frame
+                if not self.speaking and self.speech_run >= self.onset_frames:
+                    self.speaking = True
+                    events.append(("start", self.position - (self.onset_frames - 1) * self.frame))
+            else:
+                self.speech_run = 0
+                self.silence_run += 1
+                # Noise floor only tracks frames that are not speech, and falls faster than it rises
+                rate = 0.2 if energy < self.noise_db else 0.02
+                self.noise_db += rate * (energy - self.noise_db)
+                self.noise_frames += 1
+                if self.speaking and self.silence_run >= self.hangover_frames:
+                    self.speaking = False
+                    events.append(("end", self.last_speech))
+
+            self.position += self.frame
+
+        return len(energies) * self.frame, events
+
+    def trim(self, audio: np.ndarray) -> tuple:
+        # (start, end) of the padded speech region inside audio, or None when it is all silence
+        energies = self.frame_energies(audio)
+        if len(energies) == 0:
+            return None
+
+        # Relative to the noise floor that feed() tracks, or to the quietest frames when nothing has been fed
+        floor = self.noise_db if self.noise_frames > 0 else np.percentile(energies, 10)
+        threshold = floor + self.threshold_db
+        speech = np.flatnonzero(energies > max(threshold, self.min_energy_db))
+        if len(speech) == 0:
+            return None
+
+        start = max(0, int(speech[0]) * self.frame - self.pad)
+        end = min(len(audio), (int(speech[-1]) + 1) * self.frame + self.pad)
+        return start, end